@@ -12,7 +12,7 @@ import {
 } from '@/components/ui/dropdown-menu';
 import { useAuth } from '@/context/AuthContext';
 import { Bell, Menu, X } from 'lucide-react';
-import { api } from '@/lib/api';
+import { loadBootstrap } from '@/lib/api';
 import { useChurchScope } from "@/hooks/use-church-scope";
 import logo from '../../assets/logo.png';
 
@@ -35,7 +35,7 @@ export function Header() {
 
   useEffect(() => {
     if (!user) return;
-    api.getNotifications().then((items) => {
+    loadBootstrap().then(({ notifications: items }) => {
       setNotifications(items.map((item) => ({ id: item.id, title: item.title, message: item.message })));
     }).catch(() => setNotifications([]));
   }, [user]);
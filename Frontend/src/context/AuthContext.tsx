@@ -1,6 +1,6 @@
 import React, { createContext, useContext, useState, ReactNode } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { api } from '@/lib/api';
+import { api, clearBootstrap, loadBootstrap } from '@/lib/api';
 import { Church, User } from '@/types';
 import { containsUnsafeInput, isValidEmail, sanitizeText } from '@/lib/security';
 import { toast } from '@/hooks/use-toast';
@@ -54,7 +54,7 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
       const authResponse = await api.login(normalizedEmail, safePassword);
       localStorage.setItem(ACCESS_TOKEN_STORAGE_KEY, authResponse.access_token);
 
-      const profile = await api.getMe();
+      const { profile, church } = await loadBootstrap();
       const userFromApi: User = {
         id: profile.id,
         name: profile.full_name || normalizedEmail,
@@ -67,7 +67,6 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
       setUser(userFromApi);
       localStorage.setItem('user', JSON.stringify(userFromApi));
 
-      const church = await api.getChurch();
       const activeChurch: Church = {
         id: church.id,
         name: church.name,
@@ -89,6 +88,7 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   };
 
   const logout = () => {
+    clearBootstrap();
     setUser(null);
     localStorage.removeItem('user');
     localStorage.removeItem(ACCESS_TOKEN_STORAGE_KEY);
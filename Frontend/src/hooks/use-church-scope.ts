@@ -2,7 +2,7 @@ import { useEffect, useMemo, useState } from "react";
 import { useAuth } from "@/context/AuthContext";
 import { Church, Class, Student, User } from "@/types";
 import { sanitizeText } from "@/lib/security";
-import { api } from "@/lib/api";
+import { api, loadBootstrap } from "@/lib/api";
 
 function getActiveChurchFromStorage(churchId?: string): Church | undefined {
   if (!churchId) return undefined;
@@ -65,12 +65,14 @@ export function useChurchScope() {
     const load = async () => {
       setIsLoading(true);
       try {
-        const churchResponse = await api.getChurch();
+        const bootstrap = await loadBootstrap();
+        const churchResponse = bootstrap.church;
         const activeChurch: Church = { id: churchResponse.id, name: churchResponse.name, branchName: churchResponse.branch_name, location: churchResponse.location, region: churchResponse.region, district: churchResponse.district, area: churchResponse.area };
         setChurch(activeChurch);
 
         if (user.role === "admin") {
-          const [teachers, classRows, studentRows] = await Promise.all([api.getTeachers(), api.getClasses(), api.getStudents()]);
+          const [teachers, studentRows] = await Promise.all([api.getTeachers(), api.getStudents()]);
+          const classRows = bootstrap.classes as AdminClassRow[];
           const mappedUsers: User[] = teachers.map((t) => ({ id: t.id, name: t.full_name, email: t.email, role: "teacher", churchId: t.church_id, avatar: t.avatar_url, dateOfBirth: t.date_of_birth } as User));
           const mappedStudents = studentRows.map((s) => mapStudent({ ...s, church_id: s.church_id || activeChurch.id }));
           const mappedClasses: Class[] = classRows.map((c: AdminClassRow) => ({ id: c.id, name: c.name, description: c.description, ageGroup: c.age_group, churchId: c.church_id, teacherIds: (c.class_teachers || []).map((row: { teacher_id: string }) => row.teacher_id), studentIds: mappedStudents.filter((s) => s.classId === c.id).map((s) => s.id) }));
@@ -79,7 +81,8 @@ export function useChurchScope() {
           return;
         }
 
-        const [teacherClasses, teacherStudents] = await Promise.all([api.getTeacherClasses(), api.getTeacherStudents()]);
+        const teacherClasses = bootstrap.classes;
+        const teacherStudents = bootstrap.students || [];
         const mappedStudents = teacherStudents.map((s) => mapStudent({ ...s, church_id: s.church_id || (churchId || "") }));
         const mappedClasses: Class[] = teacherClasses.map((c) => ({ id: c.id, name: c.name, description: c.description, ageGroup: c.age_group, churchId: churchId || "", teacherIds: [user.id], studentIds: mappedStudents.filter((s) => s.classId === c.id).map((s) => s.id) }));
         const teacherUser: User = { id: user.id, name: user.name, email: user.email, role: "teacher", churchId: user.churchId, avatar: user.avatar };
@@ -34,15 +34,23 @@ export interface ChurchResponse {
   area?: string;
 }
 
+export type BootstrapResponse = { profile: { id: string; full_name?: string; email: string; role: "admin" | "teacher"; church_id: string; phone?: string; avatar_url?: string }; church: ChurchResponse; settings: { security: Record<string, unknown>; notifications: Record<string, boolean>; privacy: Record<string, boolean>; advanced: Record<string, unknown> }; notifications: Array<{ id: string; title: string; message: string; category: string; created_at: string }>; birthdays: Array<{ id: string; full_name: string; class_name?: string; date_of_birth: string; days_until_birthday: number; person_type: "student" | "teacher" }>; classes: Array<{ id: string; name: string; description?: string; age_group: string; church_id?: string; class_teachers?: Array<{ teacher_id: string }> }>; dashboard?: { students: number; classes: number; teachers: number }; students?: Array<{ id: string; class_id: string; church_id: string; first_name: string; last_name: string; date_of_birth: string; guardian_name: string; guardian_contact: string; allergies?: string; notes?: string; gender?: "male" | "female" | "other"; avatar_url?: string }> };
+
 interface ApiRequestOptions extends RequestInit {
   requiresAuth?: boolean;
 }
 
+// The first screens after login or a reload share one /common/bootstrap response instead of
+// separate profile, church, settings, notification, birthday and class calls. Any write drops it.
+const BOOTSTRAP_MAX_AGE_MS = 60_000;
+let bootstrapCache: { promise: Promise<BootstrapResponse>; loadedAt: number } | null = null;
+
 function getAccessToken() {
   return localStorage.getItem(ACCESS_TOKEN_STORAGE_KEY);
 }
 
 async function request<T>(path: string, options: ApiRequestOptions = {}): Promise<T> {
+  if (options.method && options.method !== "GET") bootstrapCache = null;
   const headers = new Headers(options.headers || {});
   const isFormData = typeof FormData !== "undefined" && options.body instanceof FormData;
   if (!headers.has("Content-Type") && options.body && !isFormData) headers.set("Content-Type", "application/json");
@@ -74,6 +82,7 @@ export const api = {
   login: (email: string, password: string) => request<LoginResponse>("/api/v1/auth/login", { method: "POST", body: JSON.stringify({ email, password }) }),
   signup: (payload: SignupPayload) => request<LoginResponse>("/api/v1/auth/signup", { method: "POST", body: JSON.stringify(payload) }),
   getMe: () => request<{ id: string; full_name?: string; email: string; role: "admin" | "teacher"; church_id: string; phone?: string; avatar_url?: string }>("/api/v1/common/me", { requiresAuth: true }),
+  getBootstrap: () => request<BootstrapResponse>("/api/v1/common/bootstrap", { requiresAuth: true }),
   updateMe: (payload: { full_name?: string; phone?: string; avatar_url?: string }) => request<{ id: string; full_name: string; email: string; phone?: string; avatar_url?: string }>("/api/v1/common/me", { method: "PATCH", body: JSON.stringify(payload), requiresAuth: true }),
   changePassword: (payload: { current_password: string; new_password: string }) => request<{ updated: boolean }>("/api/v1/common/me/change-password", { method: "POST", body: JSON.stringify(payload), requiresAuth: true }),
   getChurch: (accessToken?: string) => request<ChurchResponse>("/api/v1/common/church", { headers: accessToken ? { Authorization: `Bearer ${accessToken}` } : undefined, requiresAuth: !accessToken }),
@@ -124,3 +133,18 @@ export const api = {
     return request<{ avatar_url: string }>("/api/v1/storage/users/me/avatar", { method: "POST", body, requiresAuth: true });
   },
 };
+
+export function loadBootstrap(): Promise<BootstrapResponse> {
+  if (!bootstrapCache || Date.now() - bootstrapCache.loadedAt > BOOTSTRAP_MAX_AGE_MS) {
+    const promise = api.getBootstrap();
+    bootstrapCache = { promise, loadedAt: Date.now() };
+    promise.catch(() => {
+      if (bootstrapCache?.promise === promise) bootstrapCache = null;
+    });
+  }
+  return bootstrapCache.promise;
+}
+
+export function clearBootstrap() {
+  bootstrapCache = null;
+}
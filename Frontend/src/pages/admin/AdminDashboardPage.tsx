@@ -11,7 +11,7 @@ import { Link } from "react-router-dom";
 import { UserPlus, Users, FileChartLine, UserCheck } from "lucide-react";
 import logo from "@/assets/logo.png";
 import { useChurchScope } from "@/hooks/use-church-scope";
-import { api } from "@/lib/api";
+import { api, loadBootstrap } from "@/lib/api";
 import { LogoLoader } from "@/components/common/LogoLoader";
 
 export default function AdminDashboardPage() {
@@ -43,7 +43,7 @@ export default function AdminDashboardPage() {
       );
     }).catch(() => setPerformanceData([]));
 
-    api.getBirthdays(30, true).then((rows) => {
+    loadBootstrap().then(({ birthdays: rows }) => {
       const mapped = rows.filter((row) => row.person_type === "student").map((row) => {
         const names = row.full_name.split(" ");
         return {
@@ -10,7 +10,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { useAuth } from "@/context/AuthContext";
 import { toast } from "@/hooks/use-toast";
 import { Bell, Key, Lock, Save, Smartphone, UserCog } from "lucide-react";
-import { api } from "@/lib/api";
+import { api, loadBootstrap } from "@/lib/api";
 import { LogoLoader } from "@/components/common/LogoLoader";
 
 export default function SettingsPage() {
@@ -21,7 +21,7 @@ export default function SettingsPage() {
   const [privacySettings, setPrivacySettings] = useState({ showEmail: false, showPhone: true });
 
   useEffect(() => {
-    api.getSettings().then((settings) => {
+    loadBootstrap().then(({ settings }) => {
       setNotificationSettings((prev) => ({ ...prev, ...(settings.notifications as typeof prev) }));
       setPrivacySettings((prev) => ({ ...prev, ...(settings.privacy as typeof prev) }));
     }).finally(() => setLoading(false));
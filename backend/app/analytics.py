@@ -0,0 +1,26 @@
+import asyncio
+
+from .cache import single_flight
+from .config import settings
+from .supabase_client import supabase_admin
+
+
+def _rpc(name: str, church_id: str, teacher_id: str | None) -> list[dict]:
+    return supabase_admin.rpc(name, {"p_church_id": church_id, "p_teacher_id": teacher_id}).execute().data
+
+
+async def _coalesced_rpc(name: str, church_id: str, teacher_id: str | None) -> list[dict]:
+    return await single_flight.do(
+        name,
+        (church_id, teacher_id),
+        lambda: asyncio.to_thread(_rpc, name, church_id, teacher_id),
+        ttl=settings.coalesce_ttl_seconds,
+    )
+
+
+async def attendance_analytics(church_id: str, teacher_id: str | None = None) -> list[dict]:
+    return await _coalesced_rpc("get_attendance_analytics", church_id, teacher_id)
+
+
+async def performance_analytics(church_id: str, teacher_id: str | None = None) -> list[dict]:
+    return await _coalesced_rpc("get_performance_analytics", church_id, teacher_id)
@@ -1,4 +1,7 @@
+import asyncio
 import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
 import httpx
@@ -6,11 +9,15 @@ from fastapi import Depends, Header, HTTPException, status
 from jose import JWTError, jwk, jwt
 from jose.utils import base64url_decode
 
+from .cache import cache, single_flight
 from .config import settings
 from .supabase_client import supabase_admin
 
 _jwks_cache: dict[str, Any] = {"keys": [], "expires_at": 0}
 
+# Set by /batch so its sub-requests reuse the caller's verified claims and user.
+batch_auth_ctx: ContextVar[tuple[Dict[str, Any], Dict[str, Any]] | None] = ContextVar("batch_auth", default=None)
+
 
 async def _get_jwks() -> list[dict[str, Any]]:
     now = int(time.time())
@@ -28,6 +35,10 @@ async def _get_jwks() -> list[dict[str, Any]]:
 
 
 async def verify_supabase_token(authorization: str | None = Header(default=None)) -> Dict[str, Any]:
+    batch_auth = batch_auth_ctx.get()
+    if batch_auth:
+        return batch_auth[0]
+
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
 
@@ -66,11 +77,24 @@ async def verify_supabase_token(authorization: str | None = Header(default=None)
     return claims
 
 
-async def get_current_profile(token_claims: dict[str, Any] = Depends(verify_supabase_token)) -> Dict[str, Any]:
-    user_id = token_claims.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing subject")
+def _load_revoked_users() -> frozenset[str]:
+    since = datetime.now(timezone.utc) - timedelta(seconds=settings.access_token_ttl_seconds)
+    res = supabase_admin.table("revoked_users").select("user_id").gte("revoked_at", since.isoformat()).execute()
+    return frozenset(row["user_id"] for row in res.data)
+
 
+async def _is_revoked(user_id: str) -> bool:
+    # remove_teacher records removals in revoked_users, which every worker polls; the cache entry set
+    # by the removing request takes effect at once, before the next poll.
+    if await cache.get(f"revoked:{user_id}"):
+        return True
+    revoked = await single_flight.do(
+        "revoked_users", (), lambda: asyncio.to_thread(_load_revoked_users), ttl=settings.revocation_refresh_seconds
+    )
+    return user_id in revoked
+
+
+def _load_profile(user_id: str) -> Dict[str, Any]:
     profile_res = (
         supabase_admin.table("users")
         .select("id, full_name, email, role, church_id, phone, avatar_url")
@@ -85,10 +109,47 @@ async def get_current_profile(token_claims: dict[str, Any] = Depends(verify_supa
     return profile_res.data
 
 
+async def get_current_user(token_claims: dict[str, Any] = Depends(verify_supabase_token)) -> Dict[str, Any]:
+    """Identity and authorization fields (id, email, role, church_id, coordinator_region) from the token alone.
+
+    ``custom_access_token_hook`` puts ``user_role``, ``church_id`` and, for regional coordinators,
+    ``coordinator_region`` in the token. Tokens issued before the hook was enabled fall back to
+    loading the profile, and carry no coordinator grant until they are refreshed.
+    """
+    batch_auth = batch_auth_ctx.get()
+    if batch_auth:
+        return batch_auth[1]
+
+    user_id = token_claims.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing subject")
+
+    # Removed users keep a signed token until it expires.
+    if await _is_revoked(user_id):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User no longer exists")
+
+    if not token_claims.get("user_role") or not token_claims.get("church_id"):
+        profile = _load_profile(user_id)
+        return {**{key: profile[key] for key in ("id", "email", "role", "church_id")}, "coordinator_region": None}
+
+    return {
+        "id": user_id,
+        "email": token_claims.get("email"),
+        "role": token_claims["user_role"],
+        "church_id": token_claims["church_id"],
+        "coordinator_region": token_claims.get("coordinator_region"),
+    }
+
+
+async def get_current_profile(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    """The full ``users`` row, for endpoints that need more than the token carries (name, phone, avatar)."""
+    return _load_profile(user["id"])
+
+
 def require_role(*allowed_roles: str):
-    async def _validator(profile: Dict[str, Any] = Depends(get_current_profile)) -> Dict[str, Any]:
-        if profile["role"] not in allowed_roles:
+    async def _validator(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+        if user["role"] not in allowed_roles:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
-        return profile
+        return user
 
     return _validator
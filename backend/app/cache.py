@@ -0,0 +1,298 @@
+import asyncio
+import math
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+import orjson
+
+from .config import settings
+
+
+class CacheBackend(ABC):
+    """Async key/value store with per-key TTL and tag-based invalidation."""
+
+    # Whether every worker sees the same entries; state that must agree across workers needs this.
+    shared = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: int | None = None, tags: Iterable[str] = ()) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    async def invalidate_tags(self, *tags: str) -> None: ...
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take one token from the bucket at ``key``; 0 if allowed, else seconds until a token is free."""
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU. Each worker has its own copy, so prefer RedisCache with several workers."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Any, float | None, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int | None = None, tags: Iterable[str] = ()) -> None:
+        self._drop(key)
+        tags = tuple(tags)
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._drop(key)
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        for tag in tags:
+            for key in self._tags.pop(tag, set()):
+                self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        # No awaits between the read and the write, so this is atomic on the event loop.
+        now = time.monotonic()
+        tokens, updated = await self.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        # A bucket left alone refills completely by the time the entry expires.
+        await self.set(key, (tokens - 1, now), ttl=math.ceil(burst / rate) + 1)
+        return 0.0
+
+
+# Token bucket as a hash of (tokens, updated). Runs atomically on the server using the server's clock,
+# so every worker draws from the same bucket. Returns a string so fractional waits survive.
+_TAKE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+if tokens < 1 then
+  return tostring((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return '0'
+"""
+
+
+class RedisCache(CacheBackend):
+    """Shared cache over the Redis protocol (Redis, Valkey, KeyDB, ...). Values are stored as JSON."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "kkc:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+
+    async def get(self, key: str) -> Any | None:
+        raw = await self._redis.get(self.prefix + key)
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: int | None = None, tags: Iterable[str] = ()) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + key, orjson.dumps(value), ex=ttl)
+            for tag in tags:
+                tag_key = f"{self.prefix}tag:{tag}"
+                pipe.sadd(tag_key, key)
+                # The set lives as long as its longest-lived member, so it cannot outgrow the keyspace.
+                if ttl:
+                    pipe.expire(tag_key, ttl, nx=True)
+                    pipe.expire(tag_key, ttl, gt=True)
+                else:
+                    pipe.persist(tag_key)
+            await pipe.execute()
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._redis.delete(*(self.prefix + key for key in keys))
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.smembers(tag_key)
+                pipe.delete(tag_key)
+                members, _ = await pipe.execute()
+            if members:
+                await self._redis.delete(*(self.prefix + member.decode() for member in members))
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[rate, burst]))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical loads into one upstream call.
+
+    Callers sharing ``(name, *key)`` while a load is in flight await the same result. With
+    ``ttl`` the result is also reused for that many seconds after it completes. ``stats``
+    counts, per name, the loads started and the calls served by an in-flight or recent result.
+    """
+
+    _MAX_RECENT = 1024
+
+    def __init__(self):
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._recent: dict[tuple, tuple[Any, float]] = {}
+        self.stats: dict[str, dict[str, int]] = defaultdict(lambda: {"loads": 0, "coalesced": 0, "recent_hits": 0})
+
+    async def do(self, name: str, key: tuple[Hashable, ...], loader: Callable[[], Awaitable[Any]], ttl: float = 0) -> Any:
+        full_key = (name, *key)
+        counters = self.stats[name]
+
+        recent = self._recent.get(full_key)
+        if recent is not None:
+            if time.monotonic() < recent[1]:
+                counters["recent_hits"] += 1
+                return recent[0]
+            del self._recent[full_key]
+
+        pending = self._inflight.get(full_key)
+        if pending is not None:
+            counters["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        counters["loads"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            value = await loader()
+            future.set_result(value)
+            if ttl:
+                self._remember(full_key, value, ttl)
+            return value
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so a failure nobody else awaited does not log "exception was never retrieved".
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(full_key, None)
+
+    def _remember(self, full_key: tuple, value: Any, ttl: float) -> None:
+        now = time.monotonic()
+        if len(self._recent) >= self._MAX_RECENT:
+            self._recent = {k: v for k, v in self._recent.items() if v[1] > now}
+        if len(self._recent) < self._MAX_RECENT:
+            self._recent[full_key] = (value, now + ttl)
+
+
+single_flight = SingleFlight()
+
+# Generations only need to outlive the slowest load that might compare them.
+_GENERATION_TTL = 86400
+
+
+class Cache:
+    """Front for a CacheBackend that adds single-flight loading of missing keys."""
+
+    def __init__(self, backend: CacheBackend, default_ttl: int | None = None):
+        self.backend = backend
+        self.default_ttl = default_ttl
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    async def get(self, key: str) -> Any | None:
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value: Any, ttl: int | None = None, tags: Iterable[str] = ()) -> None:
+        await self.backend.set(key, value, ttl or self.default_ttl, tags)
+
+    async def delete(self, *keys: str) -> None:
+        await self._bump_generations(keys)
+        await self.backend.delete(*keys)
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        await self._bump_generations(tags)
+        await self.backend.invalidate_tags(*tags)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return await self.backend.take(key, rate, burst)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int | None = None,
+        tags: Iterable[str] = (),
+        name: str = "cache",
+    ) -> Any:
+        value = await self.backend.get(key)
+        if value is not None:
+            return value
+        tags = tuple(tags)
+
+        async def load_and_store() -> Any:
+            # An invalidation that lands while the loader runs may have read the old rows; storing
+            # that result would outlive the invalidation, so only store if nothing was bumped.
+            before = await self._generations((key, *tags))
+            loaded = await loader()
+            if loaded is not None and await self._generations((key, *tags)) == before:
+                await self.set(key, loaded, ttl, tags)
+            return loaded
+
+        return await single_flight.do(name, (key,), load_and_store)
+
+    async def _generations(self, names: Iterable[str]) -> list[Any]:
+        return await asyncio.gather(*(self.backend.get(f"generation:{name}") for name in names))
+
+    async def _bump_generations(self, names: Iterable[str]) -> None:
+        for name in names:
+            await self.backend.set(f"generation:{name}", uuid.uuid4().hex, ttl=_GENERATION_TTL)
+
+
+def _build_backend() -> CacheBackend:
+    if settings.cache_url:
+        return RedisCache(settings.cache_url)
+    return MemoryCache(settings.cache_max_entries)
+
+
+cache = Cache(_build_backend(), default_ttl=settings.cache_default_ttl_seconds)
@@ -0,0 +1,41 @@
+import asyncio
+
+from .cache import cache
+from .config import settings
+from .supabase_client import supabase_admin
+
+
+def _key(teacher_id: str) -> str:
+    return f"class-ids:{teacher_id}"
+
+
+def _tag(church_id: str) -> str:
+    return f"class-membership:{church_id}"
+
+
+def _load_class_ids(teacher_id: str) -> list[str]:
+    res = supabase_admin.table("class_teachers").select("class_id").eq("teacher_id", teacher_id).execute()
+    return [row["class_id"] for row in res.data]
+
+
+async def teacher_class_ids(teacher_id: str, church_id: str) -> list[str]:
+    return await cache.get_or_load(
+        _key(teacher_id),
+        lambda: asyncio.to_thread(_load_class_ids, teacher_id),
+        ttl=settings.class_membership_ttl_seconds,
+        tags=[_tag(church_id)],
+    )
+
+
+async def assigned_class_ids(teacher_id: str) -> list[str]:
+    # Uncached, for writes: without a shared cache, an unassignment only invalidates the worker
+    # that handled it, so the cached ids are good enough to filter reads but not to authorize writes.
+    return await asyncio.to_thread(_load_class_ids, teacher_id)
+
+
+async def invalidate_teacher(teacher_id: str) -> None:
+    await cache.delete(_key(teacher_id))
+
+
+async def invalidate_church_memberships(church_id: str) -> None:
+    await cache.invalidate_tags(_tag(church_id))
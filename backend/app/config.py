@@ -16,6 +16,44 @@ class Settings(BaseSettings):
     supabase_storage_bucket: str = "student-avatars"
     supabase_user_avatar_bucket: str = "user-avatars"
     jwt_cache_ttl_seconds: int = 3600
+    access_token_ttl_seconds: int = 3600
+    revocation_refresh_seconds: float = 5.0
+    class_membership_ttl_seconds: int = 300
+    cache_url: str | None = None
+    cache_max_entries: int = 10000
+    cache_default_ttl_seconds: int = 300
+    coalesce_ttl_seconds: float = 2.0
+    etag_version_ttl_seconds: int = 86400
+    batch_max_requests: int = 20
+    batch_concurrency: int = 4
+    regional_cache_ttl_seconds: int = 3600
+    regional_default_days: int = 90
+    regional_max_days: int = 366
+    report_workers: int = 2
+    report_load_concurrency: int = 4
+    report_bucket: str = "report-cards"
+    report_job_ttl_seconds: int = 86400
+    report_url_ttl_seconds: int = 3600
+    log_queue_size: int = 10000
+    log_batch_size: int = 256
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.0
+    profiling_interval_ms: float = 1.0
+    profiling_dir: str = "profiles"
+    profiling_max_files: int = 200
+    # Token-bucket budgets per route class and scope (ip, user, church), as "<requests>/<seconds>".
+    rate_limits: dict[str, dict[str, str]] = {
+        "login": {"ip": "20/300", "user": "5/300"},
+        "signup": {"ip": "5/3600"},
+        "change_password": {"ip": "10/900", "user": "5/900"},
+        "sms": {"user": "3/3600", "church": "5/3600"},
+        "default": {"ip": "600/60", "user": "300/60", "church": "3000/60"},
+    }
+    # Proxies in front of the app that append to X-Forwarded-For; 0 uses the socket address.
+    rate_limit_trusted_proxies: int = 0
+    upstream_max_concurrency: int = 64
+    upstream_max_waiting: int = 256
+    upstream_wait_timeout_ms: int = 2000
 
     smtp_host: str | None = None
     smtp_port: int = 587
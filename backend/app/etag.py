@@ -0,0 +1,60 @@
+import hashlib
+import uuid
+
+from fastapi import Depends, HTTPException, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from .auth import get_current_user, require_role
+from .cache import cache
+from .config import settings
+
+
+def _version_key(scope: str) -> str:
+    return f"version:{scope}"
+
+
+async def current_version(scope: str) -> str:
+    version = await cache.get(_version_key(scope))
+    if version is None:
+        version = uuid.uuid4().hex
+        await cache.set(_version_key(scope), version, ttl=settings.etag_version_ttl_seconds)
+    return version
+
+
+async def bump_version(*scopes: str) -> None:
+    for scope in scopes:
+        await cache.set(_version_key(scope), uuid.uuid4().hex, ttl=settings.etag_version_ttl_seconds)
+
+
+def conditional_get(*scopes: str, roles: tuple[str, ...] = ()):
+    """Answer 304 from version stamps alone, before the handler queries anything.
+
+    ``scopes`` are templates such as ``"students:{church_id}"`` filled from the caller's profile.
+    Only active with a shared cache: a stamp bumped in one worker's memory is invisible to the others,
+    which would keep answering 304 with stale data.
+    """
+    profile_dependency = require_role(*roles) if roles else get_current_user
+
+    async def _guard(request: Request, profile=Depends(profile_dependency)) -> None:
+        if not cache.shared:
+            return
+        versions = [await current_version(scope.format(**profile)) for scope in scopes]
+        fingerprint = "|".join([request.url.path, request.url.query, profile["id"], *versions])
+        etag = f'"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+        request.state.etag = etag
+
+    return _guard
+
+
+class ETagMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        etag = getattr(request.state, "etag", None)
+        if etag and response.status_code == 200:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "private, no-cache"
+        return response
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import multiprocessing
+import shutil
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .config import settings
+from .report_cards import render_class
+from .supabase_client import supabase_admin
+
+logger = logging.getLogger("app.jobs")
+
+_pool: ProcessPoolExecutor | None = None
+# Strong references to running jobs; the event loop only keeps weak ones.
+_tasks: set[asyncio.Task] = set()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: forking a process that runs an event loop and worker threads is unsafe.
+        _pool = ProcessPoolExecutor(max_workers=settings.report_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _reset_pool() -> None:
+    # A worker died (e.g. OOM); a broken pool rejects all later work, so start a fresh one next time.
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown() -> None:
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Jobs live in Postgres rather than the cache, so any worker can report on a job another one runs.
+_PROGRESS_FIELDS = ("status", "total", "done", "error", "path", "finished_at")
+
+
+def _cutoff() -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=settings.report_job_ttl_seconds)).isoformat()
+
+
+def _load_job(job_id: str) -> dict | None:
+    res = supabase_admin.table("report_jobs").select("*").eq("id", job_id).gte("created_at", _cutoff()).execute()
+    return res.data[0] if res.data else None
+
+
+async def get_job(job_id: str) -> dict | None:
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return None
+    return await asyncio.to_thread(_load_job, job_id)
+
+
+def _insert_job(job: dict) -> dict:
+    supabase_admin.table("report_jobs").delete().eq("church_id", job["church_id"]).lt("created_at", _cutoff()).execute()
+    return supabase_admin.table("report_jobs").insert(job).execute().data[0]
+
+
+def _update_job(job: dict) -> None:
+    supabase_admin.table("report_jobs").update({field: job.get(field) for field in _PROGRESS_FIELDS}).eq("id", job["id"]).execute()
+
+
+async def _save(job: dict) -> None:
+    await asyncio.to_thread(_update_job, job)
+
+
+def _load_classes(church_id: str, class_ids: list[str] | None) -> list[dict]:
+    query = supabase_admin.table("classes").select("id, students(count)").eq("church_id", church_id).order("name")
+    if class_ids:
+        query = query.in_("id", class_ids)
+    return query.execute().data
+
+
+def _load_class_report(church_id: str, class_id: str, date_from: str, date_to: str) -> dict | None:
+    params = {"p_church_id": church_id, "p_class_id": class_id, "p_from": date_from, "p_to": date_to}
+    return supabase_admin.rpc("get_class_report_data", params).execute().data
+
+
+def _zip_and_upload(job: dict, workdir: Path) -> str:
+    archive = workdir.with_suffix(".zip")
+    try:
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for path in sorted(workdir.rglob("*")):
+                if path.is_file():
+                    zf.write(path, path.relative_to(workdir))
+        storage_path = f"{job['church_id']}/{job['id']}.zip"
+        supabase_admin.storage.from_(settings.report_bucket).upload(
+            path=storage_path,
+            file=archive.read_bytes(),
+            file_options={"content-type": "application/zip", "upsert": "true"},
+        )
+        return storage_path
+    finally:
+        archive.unlink(missing_ok=True)
+
+
+def signed_url(job: dict) -> str:
+    res = supabase_admin.storage.from_(settings.report_bucket).create_signed_url(job["path"], settings.report_url_ttl_seconds)
+    return res["signedURL"]
+
+
+async def enqueue_report_cards(profile: dict, class_ids: list[str] | None, date_from: str, date_to: str, fmt: str) -> dict:
+    job = {
+        "type": "report-cards",
+        "status": "queued",
+        "church_id": profile["church_id"],
+        "created_by": profile["id"],
+        "format": fmt,
+        "date_from": date_from,
+        "date_to": date_to,
+        "total": 0,
+        "done": 0,
+    }
+    job = await asyncio.to_thread(_insert_job, job)
+    task = asyncio.create_task(_run_report_cards(job, class_ids))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+async def _run_report_cards(job: dict, class_ids: list[str] | None) -> None:
+    """Load each class in one RPC (a few at a time) and render it in the process pool as it arrives."""
+    workdir = Path(tempfile.mkdtemp(prefix=f"report-cards-{job['id']}-"))
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(settings.report_load_concurrency)
+    # Saves run in threads; one at a time so a slower, older count never lands after a newer one.
+    save_lock = asyncio.Lock()
+    # Set by the first failure so classes not yet started are skipped. Renders already in the pool
+    # cannot be cancelled and keep writing into workdir, so they are awaited, not abandoned.
+    failed = asyncio.Event()
+
+    async def build_class(class_id: str) -> None:
+        try:
+            async with semaphore:
+                if failed.is_set():
+                    return
+                data = await asyncio.to_thread(_load_class_report, job["church_id"], class_id, job["date_from"], job["date_to"])
+            if not data or not data["students"] or failed.is_set():
+                return
+            rendered = await loop.run_in_executor(
+                _get_pool(), render_class, data, job["format"], str(workdir), job["date_from"], job["date_to"]
+            )
+            job["done"] += rendered
+            async with save_lock:
+                await _save(job)
+        except Exception:
+            failed.set()
+            raise
+
+    try:
+        classes = await asyncio.to_thread(_load_classes, job["church_id"], class_ids)
+        job["status"] = "running"
+        job["total"] = sum(row["students"][0]["count"] for row in classes if row.get("students"))
+        async with save_lock:
+            await _save(job)
+
+        results = await asyncio.gather(*(build_class(row["id"]) for row in classes), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        job["path"] = await asyncio.to_thread(_zip_and_upload, job, workdir)
+        job["status"] = "completed"
+    except Exception as exc:
+        if isinstance(exc, BrokenProcessPool):
+            _reset_pool()
+        logger.exception("report-card job %s failed", job["id"])
+        job["status"] = "failed"
+        job["error"] = str(exc) or type(exc).__name__
+    finally:
+        job["finished_at"] = datetime.now(timezone.utc).isoformat()
+        async with save_lock:
+            await _save(job)
+        shutil.rmtree(workdir, ignore_errors=True)
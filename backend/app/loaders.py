@@ -0,0 +1,73 @@
+import asyncio
+
+from .cache import cache
+from .class_membership import teacher_class_ids
+from .etag import bump_version
+from .schemas.admin import ClassOut, StudentOut
+from .schemas.teacher import TeacherClassOut
+from .serialization import select_columns
+from .supabase_client import supabase_admin
+
+
+def dashboard_counts(church_id: str) -> dict:
+    students = supabase_admin.table("students").select("id", count="exact").eq("church_id", church_id).execute()
+    classes = supabase_admin.table("classes").select("id", count="exact").eq("church_id", church_id).execute()
+    teachers = (
+        supabase_admin.table("users")
+        .select("id", count="exact")
+        .eq("church_id", church_id)
+        .eq("role", "teacher")
+        .execute()
+    )
+    return {"students": students.count or 0, "classes": classes.count or 0, "teachers": teachers.count or 0}
+
+
+def _load_church(church_id: str) -> dict:
+    return supabase_admin.table("churches").select("*").eq("id", church_id).single().execute().data
+
+
+def _load_classes(church_id: str, fields: str | None) -> list[dict]:
+    return supabase_admin.table("classes").select(select_columns(ClassOut, fields)).eq("church_id", church_id).order("name").execute().data
+
+
+async def church(church_id: str) -> dict:
+    return await cache.get_or_load(
+        f"church:{church_id}",
+        lambda: asyncio.to_thread(_load_church, church_id),
+        tags=[f"church:{church_id}"],
+        name="church",
+    )
+
+
+async def classes(church_id: str, fields: str | None = None) -> list[dict]:
+    return await cache.get_or_load(
+        f"classes:{church_id}:{fields or '*'}",
+        lambda: asyncio.to_thread(_load_classes, church_id, fields),
+        tags=[f"church:{church_id}", f"classes:{church_id}"],
+    )
+
+
+async def invalidate_classes(church_id: str) -> None:
+    await cache.invalidate_tags(f"classes:{church_id}")
+    await bump_version(f"classes:{church_id}")
+
+
+def classes_by_id(class_ids: list[str], columns: str) -> list[dict]:
+    if not class_ids:
+        return []
+    return supabase_admin.table("classes").select(columns).in_("id", class_ids).order("name").execute().data
+
+
+def students_in_classes(class_ids: list[str], fields: str | None = None) -> list[dict]:
+    if not class_ids:
+        return []
+    return supabase_admin.table("students").select(select_columns(StudentOut, fields)).in_("class_id", class_ids).order("first_name").execute().data
+
+
+async def teacher_view(profile: dict) -> dict:
+    class_ids = await teacher_class_ids(profile["id"], profile["church_id"])
+    classes, students = await asyncio.gather(
+        asyncio.to_thread(classes_by_id, class_ids, select_columns(TeacherClassOut)),
+        asyncio.to_thread(students_in_classes, class_ids),
+    )
+    return {"classes": classes, "students": students}
@@ -1,20 +1,26 @@
-import json
+import atexit
 import logging
+import queue
 import sys
+import threading
 import time
 import uuid
 from contextvars import ContextVar
+from logging.handlers import QueueHandler
 
+import orjson
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from .config import settings
+
 request_id_ctx: ContextVar[str] = ContextVar("request_id", default="-")
 
 
 class JsonFormatter(logging.Formatter):
-    def format(self, record: logging.LogRecord) -> str:
+    def encode(self, record: logging.LogRecord) -> bytes:
         payload = {
-            "timestamp": int(time.time()),
+            "timestamp": int(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -24,7 +30,105 @@ class JsonFormatter(logging.Formatter):
             value = getattr(record, key, None)
             if value is not None:
                 payload[key] = value
-        return json.dumps(payload)
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str)
+
+    def format(self, record: logging.LogRecord) -> str:
+        return self.encode(record).decode()
+
+
+class LogWriter:
+    """Background thread that drains the log queue and writes JSON lines to ``stream`` in batches."""
+
+    def __init__(self, log_queue: queue.Queue, stream, batch_size: int):
+        self.queue = log_queue
+        self.stream = stream
+        self.batch_size = batch_size
+        self.formatter = JsonFormatter()
+        self.dropped = 0
+        self.written = 0
+        self._reported_drops = 0
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write everything still queued, then stop. Later records are written synchronously."""
+        if not self.running:
+            return
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def write(self, records: list[logging.LogRecord]) -> None:
+        lines = [self.formatter.encode(record) for record in records]
+        if self.dropped != self._reported_drops:
+            lines.append(orjson.dumps({
+                "timestamp": int(time.time()),
+                "level": "WARNING",
+                "logger": "app.logging",
+                "message": f"log queue full, dropped {self.dropped - self._reported_drops} records",
+                "request_id": "-",
+            }))
+            self._reported_drops = self.dropped
+        self.stream.write(b"\n".join(lines) + b"\n")
+        self.stream.flush()
+        self.written += len(records)
+
+    def _run(self) -> None:
+        while True:
+            record = self.queue.get()
+            batch, stopping = [], record is None
+            if record is not None:
+                batch.append(record)
+            while len(batch) < self.batch_size and not stopping:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                else:
+                    batch.append(record)
+            if batch:
+                try:
+                    self.write(batch)
+                except Exception:
+                    # Never let a broken stream kill the writer; the records are lost like drops.
+                    self.dropped += len(batch)
+            if stopping:
+                return
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to ``LogWriter`` without blocking; a full queue drops the record and counts it."""
+
+    def __init__(self, writer: LogWriter):
+        super().__init__(writer.queue)
+        self.writer = writer
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve what depends on the caller (request id, message args) before crossing threads.
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_ctx.get()
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if not self.writer.running:
+            self.writer.write([record])
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.writer.dropped += 1
 
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
@@ -50,10 +154,17 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         return response
 
 
-def configure_logging() -> None:
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(JsonFormatter())
+log_writer = LogWriter(queue.Queue(maxsize=settings.log_queue_size), sys.stdout.buffer, settings.log_batch_size)
+
 
+def configure_logging() -> None:
     root = logging.getLogger()
     root.setLevel(logging.INFO)
-    root.handlers = [handler]
+    root.handlers = [BoundedQueueHandler(log_writer)]
+    if not log_writer.running:
+        log_writer.start()
+        atexit.register(log_writer.stop)
+
+
+def log_stats() -> dict:
+    return {"queued": log_writer.queue.qsize(), "written": log_writer.written, "dropped": log_writer.dropped}
@@ -1,12 +1,32 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
+from . import jobs
+from .auth import require_role
+from .cache import single_flight
 from .config import settings
-from .logging import RequestLoggingMiddleware, configure_logging
-from .routers import admin, auth, common, storage, teacher
+from .etag import ETagMiddleware
+from .logging import RequestLoggingMiddleware, configure_logging, log_stats, log_writer
+from .profiling import ProfilingMiddleware
+from .rate_limit import AdmissionMiddleware, admission_stats, rate_limit
+from .routers import admin, auth, batch, common, profiles, regional, reports, storage, teacher
 
 configure_logging()
-app = FastAPI(title=settings.app_name)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    jobs.shutdown()
+    log_writer.stop()
+
+
+app = FastAPI(title=settings.app_name, default_response_class=ORJSONResponse, lifespan=lifespan)
+# Inside CORS, so a browser can read the 503 and its Retry-After when load is shed.
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[origin.strip() for origin in settings.cors_allowed_origins.split(",") if origin.strip()],
@@ -14,6 +34,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ETagMiddleware)
+# Inside request logging, so the request id is already set when a profile is named.
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
 
 
@@ -22,8 +46,33 @@ async def health_check():
     return {"status": "ok"}
 
 
+# Internal counters tell a caller how close the service is to shedding load, so only admins see them.
+admin_only = [Depends(require_role("admin"))]
+
+
+@app.get("/health/coalescing", dependencies=admin_only)
+async def coalescing_stats():
+    return single_flight.stats
+
+
+@app.get("/health/logging", dependencies=admin_only)
+async def logging_stats():
+    return log_stats()
+
+
+@app.get("/health/admission", dependencies=admin_only)
+async def admission():
+    return admission_stats
+
+
+# Auth routes apply their own budgets; everything else shares the "default" one.
+default_limit = [Depends(rate_limit("default"))]
 app.include_router(auth.router, prefix=settings.api_prefix)
-app.include_router(common.router, prefix=settings.api_prefix)
-app.include_router(admin.router, prefix=settings.api_prefix)
-app.include_router(teacher.router, prefix=settings.api_prefix)
-app.include_router(storage.router, prefix=settings.api_prefix)
+app.include_router(common.router, prefix=settings.api_prefix, dependencies=default_limit)
+app.include_router(admin.router, prefix=settings.api_prefix, dependencies=default_limit)
+app.include_router(teacher.router, prefix=settings.api_prefix, dependencies=default_limit)
+app.include_router(regional.router, prefix=settings.api_prefix, dependencies=default_limit)
+app.include_router(reports.router, prefix=settings.api_prefix, dependencies=default_limit)
+app.include_router(profiles.router, prefix=settings.api_prefix, dependencies=default_limit)
+app.include_router(storage.router, prefix=settings.api_prefix, dependencies=default_limit)
+app.include_router(batch.router, prefix=settings.api_prefix, dependencies=default_limit)
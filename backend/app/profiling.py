@@ -0,0 +1,136 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from pathlib import Path
+
+from fastapi import HTTPException
+from pyinstrument import Profiler
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .auth import get_current_user, verify_supabase_token
+from .config import settings
+from .logging import request_id_ctx
+
+logger = logging.getLogger("app.profiling")
+
+PROFILE_HEADER = b"x-profile"
+_unsafe = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def profile_dir() -> Path:
+    return Path(settings.profiling_dir)
+
+
+async def _caller(authorization: bytes | None) -> dict | None:
+    if not authorization:
+        return None
+    try:
+        claims = await verify_supabase_token(authorization.decode())
+        return await get_current_user(claims)
+    except HTTPException:
+        return None
+
+
+def _write_profile(profiler: Profiler, meta: dict) -> None:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{meta['id']}.html").write_text(profiler.output_html())
+    (directory / f"{meta['id']}.json").write_text(json.dumps(meta))
+
+    # Keep the newest profiling_max_files; ids start with a millisecond timestamp, so they sort by age.
+    for stale in sorted(directory.glob("*.json"))[: -settings.profiling_max_files]:
+        stale.unlink(missing_ok=True)
+        stale.with_suffix(".html").unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Profile a request with pyinstrument when an admin sends ``X-Profile: 1`` or it is sampled.
+
+    Only installed when ``PROFILING_ENABLED`` is set, so it costs nothing otherwise. Saved profiles are
+    named after the request id from ``app.logging`` and listed under ``/admin/profiles``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) == b"1":
+            user = await _caller(headers.get(b"authorization"))
+            trigger = "header" if user and user["role"] == "admin" else None
+        elif settings.profiling_sample_rate and random.random() < settings.profiling_sample_rate:
+            user = await _caller(headers.get(b"authorization"))
+            trigger = "sampled"
+        else:
+            trigger = None
+
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = request_id_ctx.get()
+        profile_id = f"{int(time.time() * 1000)}-{_unsafe.sub('', request_id)[:64]}"
+        status_code = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = Profiler(interval=settings.profiling_interval_ms / 1000, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            meta = {
+                "id": profile_id,
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "trigger": trigger,
+                "user_id": user["id"] if user else None,
+                "church_id": user["church_id"] if user else None,
+                "created_at": time.time(),
+            }
+            # Rendering takes a while; do it after the response, off the event loop.
+            asyncio.get_running_loop().run_in_executor(None, _write_profile, profiler, meta)
+            logger.info("request profiled as %s", profile_id, extra={"request_id": request_id})
+
+
+def list_profiles(church_id: str, limit: int) -> list[dict]:
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        meta = json.loads(path.read_text())
+        if meta["church_id"] == church_id:
+            profiles.append(meta)
+            if len(profiles) == limit:
+                break
+    return profiles
+
+
+def profile_html(church_id: str, profile_id: str) -> Path | None:
+    if _unsafe.search(profile_id):
+        return None
+    meta_path = profile_dir() / f"{profile_id}.json"
+    html_path = meta_path.with_suffix(".html")
+    if not meta_path.is_file() or not html_path.is_file():
+        return None
+    if json.loads(meta_path.read_text())["church_id"] != church_id:
+        return None
+    return html_path
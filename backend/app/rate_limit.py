@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import math
+from functools import lru_cache
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .auth import get_current_user
+from .cache import cache
+from .config import settings
+
+logger = logging.getLogger("app.rate_limit")
+
+admission_stats = {"in_flight": 0, "waiting": 0, "admitted": 0, "shed": 0}
+
+
+@lru_cache
+def _budget(spec: str) -> tuple[float, int]:
+    """``"<requests>/<seconds>"`` as (tokens per second, burst)."""
+    requests, seconds = spec.split("/")
+    return int(requests) / float(seconds), int(requests)
+
+
+def client_ip(request: Request) -> str:
+    # Each trusted proxy appends the address it saw; anything further left is up to the client.
+    hops = settings.rate_limit_trusted_proxies
+    if hops:
+        forwarded = [entry.strip() for entry in request.headers.get("x-forwarded-for", "").split(",") if entry.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else "-"
+
+
+async def check_rate_limit(
+    route_class: str, request: Request, user_id: str | None = None, church_id: str | None = None
+) -> None:
+    """Take a token from each of ``route_class``'s buckets that applies; 429 once any of them is empty.
+
+    Buckets live in the shared cache, so with Redis the budgets hold across workers.
+    """
+    subjects = {"ip": client_ip(request), "user": user_id, "church": church_id}
+    for scope, spec in settings.rate_limits.get(route_class, {}).items():
+        subject = subjects.get(scope)
+        if subject is None:
+            continue
+        rate, burst = _budget(spec)
+        wait = await cache.take(f"rate:{route_class}:{scope}:{subject}", rate, burst)
+        if wait:
+            logger.warning("rate limit %s/%s exceeded for %s", route_class, scope, subject)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+def rate_limit(route_class: str):
+    """Dependency applying ``route_class``'s budgets to the caller's IP, user and church."""
+
+    async def dependency(request: Request, user=Depends(get_current_user)) -> None:
+        await check_rate_limit(route_class, request, user["id"], user["church_id"])
+
+    return dependency
+
+
+class AdmissionMiddleware:
+    """Caps API requests in flight, and so the upstream Supabase calls they make, across the worker.
+
+    Requests over ``upstream_max_concurrency`` wait up to ``upstream_wait_timeout_ms`` for a slot, with
+    at most ``upstream_max_waiting`` waiting; the rest are shed with 503 and ``Retry-After`` rather than
+    piling up behind a slow upstream. ``/batch`` is exempt because each of its sub-requests takes a slot.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.semaphore = asyncio.Semaphore(settings.upstream_max_concurrency)
+        self.exempt = (f"{settings.api_prefix}/batch",)
+        self.stats = admission_stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or not path.startswith(settings.api_prefix)
+            or path.startswith(self.exempt)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if not await self._acquire():
+            self.stats["shed"] += 1
+            retry_after = max(1, math.ceil(settings.upstream_wait_timeout_ms / 1000))
+            response = ORJSONResponse(
+                {"detail": "Server busy, try again shortly"},
+                status_code=503,
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.stats["admitted"] += 1
+        self.stats["in_flight"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.stats["in_flight"] -= 1
+            self.semaphore.release()
+
+    async def _acquire(self) -> bool:
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        if self.stats["waiting"] >= settings.upstream_max_waiting:
+            return False
+        self.stats["waiting"] += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), settings.upstream_wait_timeout_ms / 1000)
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            self.stats["waiting"] -= 1
@@ -0,0 +1,77 @@
+"""Report-card rendering.
+
+Runs in the job process pool, so it must stay importable without settings or a Supabase client.
+"""
+
+import html
+import re
+from pathlib import Path
+
+_STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; color: #1f2933; margin: 32px; }
+h1 { font-size: 22px; margin: 0 0 4px; }
+h2 { font-size: 15px; margin: 24px 0 8px; border-bottom: 1px solid #cbd2d9; padding-bottom: 4px; }
+.meta { color: #52606d; font-size: 13px; }
+table { border-collapse: collapse; width: 100%; font-size: 13px; }
+th, td { text-align: left; padding: 4px 6px; border-bottom: 1px solid #e4e7eb; }
+.rate { font-size: 28px; font-weight: bold; }
+.note { margin: 0 0 8px; font-size: 13px; }
+.note small { color: #7b8794; }
+"""
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "student"
+
+
+def _percent(part: float, whole: float) -> str:
+    return f"{part / whole * 100:.0f}%" if whole else "-"
+
+
+def render_card(student: dict, class_info: dict, teachers: list[str], date_from: str, date_to: str) -> str:
+    esc = html.escape
+    attendance = student.get("attendance") or {"present": 0, "total": 0}
+    scores = "".join(
+        f"<tr><td>{esc(s['title'])}</td><td>{esc(str(s['taken_on']))}</td>"
+        f"<td>{s['score']:g} / {s['max_score']:g}</td><td>{_percent(s['score'], s['max_score'])}</td></tr>"
+        for s in student.get("scores", [])
+    )
+    notes = "".join(
+        f"<p class='note'>{esc(n['note'])}<br><small>{esc(n.get('author') or '')} &middot; {esc(str(n['created_at'])[:10])}</small></p>"
+        for n in student.get("notes", [])
+    )
+    name = f"{student['first_name']} {student['last_name']}"
+    return f"""<!doctype html>
+<html><head><meta charset="utf-8"><title>{esc(name)} - Report card</title><style>{_STYLE}</style></head>
+<body>
+<h1>{esc(name)}</h1>
+<div class="meta">{esc(class_info['name'])} ({esc(class_info['age_group'])}) &middot; {esc(date_from)} to {esc(date_to)}</div>
+<div class="meta">Teachers: {esc(', '.join(teachers) or '-')}</div>
+<h2>Attendance</h2>
+<div class="rate">{_percent(attendance['present'], attendance['total'])}</div>
+<div class="meta">Present {attendance['present']} of {attendance['total']} sessions</div>
+<h2>Test scores</h2>
+{f"<table><tr><th>Test</th><th>Date</th><th>Score</th><th>%</th></tr>{scores}</table>" if scores else "<p class='meta'>No tests recorded.</p>"}
+<h2>Teacher notes</h2>
+{notes or "<p class='meta'>No notes recorded.</p>"}
+</body></html>
+"""
+
+
+def render_class(data: dict, fmt: str, out_dir: str, date_from: str, date_to: str) -> int:
+    """Write one card per student under ``out_dir/<class>/`` and return how many were written."""
+    class_info = data["class"]
+    class_dir = Path(out_dir) / f"{_slug(class_info['name'])}-{class_info['id'][:8]}"
+    class_dir.mkdir(parents=True, exist_ok=True)
+
+    if fmt == "pdf":
+        from weasyprint import HTML
+
+    for student in data["students"]:
+        document = render_card(student, class_info, data["teachers"], date_from, date_to)
+        stem = f"{_slug(student['last_name'])}-{_slug(student['first_name'])}-{student['id'][:8]}"
+        if fmt == "pdf":
+            HTML(string=document).write_pdf(class_dir / f"{stem}.pdf")
+        else:
+            (class_dir / f"{stem}.html").write_text(document, encoding="utf-8")
+    return len(data["students"])
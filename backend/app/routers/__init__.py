@@ -1,3 +1,3 @@
-from . import admin, auth, common, storage, teacher
+from . import admin, auth, batch, common, profiles, regional, reports, storage, teacher
 
-__all__ = ["admin", "auth", "common", "storage", "teacher"]
+__all__ = ["admin", "auth", "batch", "common", "profiles", "regional", "reports", "storage", "teacher"]
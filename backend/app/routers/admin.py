@@ -1,80 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
 
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .. import analytics, loaders
 from ..auth import require_role
-from ..schemas.admin import ClassCreate, StudentCreate, TeacherClassAssign, TeacherCreate
+from ..cache import cache, single_flight
+from ..class_membership import invalidate_church_memberships, invalidate_teacher
+from ..config import settings
+from ..etag import bump_version, conditional_get
+from ..schemas.admin import (
+    ClassCreate,
+    ClassOverviewOut,
+    ClassOut,
+    StudentCreate,
+    StudentOut,
+    StudentSearchOut,
+    TeacherClassAssign,
+    TeacherCreate,
+    TeacherOut,
+)
+from ..schemas.common import AttendancePoint, PerformancePoint
+from ..serialization import fieldset_response, select_columns
 from ..supabase_client import supabase_admin
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
+def _load_class_overview(church_id: str) -> list[dict]:
+    return supabase_admin.rpc("get_class_overview", {"p_church_id": church_id}).execute().data
+
+
 @router.get("/dashboard")
 async def dashboard(profile=Depends(require_role("admin"))):
-    church_id = profile["church_id"]
-    students = supabase_admin.table("students").select("id", count="exact").eq("church_id", church_id).execute()
-    classes = supabase_admin.table("classes").select("id", count="exact").eq("church_id", church_id).execute()
-    teachers = (
-        supabase_admin.table("users")
-        .select("id", count="exact")
-        .eq("church_id", church_id)
-        .eq("role", "teacher")
-        .execute()
-    )
-    return {"students": students.count or 0, "classes": classes.count or 0, "teachers": teachers.count or 0}
+    return loaders.dashboard_counts(profile["church_id"])
 
 
-@router.get("/church")
+@router.get("/church", dependencies=[Depends(conditional_get("church:{church_id}", roles=("admin",)))])
 async def get_church(profile=Depends(require_role("admin"))):
-    res = supabase_admin.table("churches").select("*").eq("id", profile["church_id"]).single().execute()
-    return res.data
+    return await loaders.church(profile["church_id"])
 
 
 @router.patch("/church")
 async def update_church(payload: dict, profile=Depends(require_role("admin"))):
     res = supabase_admin.table("churches").update(payload).eq("id", profile["church_id"]).execute()
+    await cache.invalidate_tags(f"church:{profile['church_id']}")
+    await bump_version(f"church:{profile['church_id']}")
     return res.data[0]
 
 
-@router.get("/teachers")
-async def list_teachers(profile=Depends(require_role("admin"))):
+@router.get("/teachers", response_model=list[TeacherOut])
+async def list_teachers(fields: str | None = None, profile=Depends(require_role("admin"))):
     res = (
         supabase_admin.table("users")
-        .select("id, full_name, email, phone, avatar_url, date_of_birth, role, church_id")
+        .select(select_columns(TeacherOut, fields))
         .eq("church_id", profile["church_id"])
         .eq("role", "teacher")
         .execute()
     )
-    return res.data
+    return fieldset_response(res.data, fields)
 
 
-@router.post("/teachers")
+@router.post("/teachers", response_model=TeacherOut)
 async def create_teacher(payload: TeacherCreate, profile=Depends(require_role("admin"))):
+    # The on_auth_user_profile trigger inserts the users row in the same transaction. Only role and
+    # church go in app_metadata; the personal details are dropped from user_metadata once copied.
     auth_res = supabase_admin.auth.admin.create_user(
         {
             "email": payload.email,
             "email_confirm": True,
             "password": payload.password,
-            "user_metadata": {"full_name": payload.full_name, "role": "teacher", "church_id": profile["church_id"]},
+            "user_metadata": {
+                "full_name": payload.full_name,
+                "profile": {
+                    "phone": payload.phone,
+                    "date_of_birth": str(payload.date_of_birth) if payload.date_of_birth else None,
+                },
+            },
+            "app_metadata": {"role": "teacher", "church_id": profile["church_id"]},
         }
     )
     if not auth_res.user:
         raise HTTPException(status_code=400, detail="Failed to create auth user")
-
-    insert = (
-        supabase_admin.table("users")
-        .insert(
-            {
-                "id": auth_res.user.id,
-                "full_name": payload.full_name,
-                "email": payload.email,
-                "phone": payload.phone,
-                "role": "teacher",
-                "church_id": profile["church_id"],
-                "date_of_birth": str(payload.date_of_birth) if payload.date_of_birth else None,
-            }
-        )
-        .execute()
-    )
-    return insert.data[0]
+    teacher = supabase_admin.table("users").select(select_columns(TeacherOut)).eq("id", auth_res.user.id).execute()
+    if not teacher.data:
+        raise HTTPException(status_code=500, detail="Teacher profile was not created")
+    return teacher.data[0]
 
 
 @router.patch("/teachers/{teacher_id}")
@@ -92,50 +102,65 @@ async def update_teacher(teacher_id: str, payload: dict, profile=Depends(require
 
 @router.delete("/teachers/{teacher_id}")
 async def remove_teacher(teacher_id: str, profile=Depends(require_role("admin"))):
-    supabase_admin.table("users").delete().eq("id", teacher_id).eq("church_id", profile["church_id"]).eq("role", "teacher").execute()
-    supabase_admin.auth.admin.delete_user(teacher_id)
+    res = supabase_admin.rpc("remove_teacher", {"p_church_id": profile["church_id"], "p_teacher_id": teacher_id}).execute()
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    await cache.set(f"revoked:{teacher_id}", True, ttl=settings.access_token_ttl_seconds)
+    await invalidate_teacher(teacher_id)
+    await loaders.invalidate_classes(profile["church_id"])
     return {"deleted": True}
 
 
-@router.get("/classes")
-async def list_classes(profile=Depends(require_role("admin"))):
-    res = supabase_admin.table("classes").select("*, class_teachers(teacher_id)").eq("church_id", profile["church_id"]).order("name").execute()
-    return res.data
+@router.get(
+    "/classes",
+    response_model=list[ClassOut],
+    dependencies=[Depends(conditional_get("classes:{church_id}", roles=("admin",)))],
+)
+async def list_classes(fields: str | None = None, profile=Depends(require_role("admin"))):
+    return fieldset_response(await loaders.classes(profile["church_id"], fields), fields)
+
+
+@router.get("/classes/overview", response_model=list[ClassOverviewOut])
+async def classes_overview(profile=Depends(require_role("admin"))):
+    church_id = profile["church_id"]
+    return await single_flight.do(
+        "class_overview",
+        (church_id,),
+        lambda: asyncio.to_thread(_load_class_overview, church_id),
+        ttl=settings.coalesce_ttl_seconds,
+    )
 
 
 @router.post("/classes")
 async def create_class(payload: ClassCreate, profile=Depends(require_role("admin"))):
     res = supabase_admin.table("classes").insert({**payload.model_dump(mode="json"), "church_id": profile["church_id"]}).execute()
+    await loaders.invalidate_classes(profile["church_id"])
     return res.data[0]
 
 
 @router.patch("/classes/{class_id}")
 async def update_class(class_id: str, payload: dict, profile=Depends(require_role("admin"))):
     res = supabase_admin.table("classes").update(payload).eq("id", class_id).eq("church_id", profile["church_id"]).execute()
+    await loaders.invalidate_classes(profile["church_id"])
     return res.data[0]
 
 
 @router.delete("/classes/{class_id}")
 async def delete_class(class_id: str, profile=Depends(require_role("admin"))):
     supabase_admin.table("classes").delete().eq("id", class_id).eq("church_id", profile["church_id"]).execute()
+    await loaders.invalidate_classes(profile["church_id"])
+    await invalidate_church_memberships(profile["church_id"])
     return {"deleted": True}
 
 
 @router.post("/classes/assign-teacher")
 async def assign_teacher(payload: TeacherClassAssign, profile=Depends(require_role("admin"))):
-    teacher = (
-        supabase_admin.table("users")
-        .select("id")
-        .eq("id", payload.teacher_id)
-        .eq("church_id", profile["church_id"])
-        .eq("role", "teacher")
-        .single()
-        .execute()
-    )
-    if not teacher.data:
-        raise HTTPException(status_code=404, detail="Teacher not found")
-
-    record = supabase_admin.table("class_teachers").insert(payload.model_dump(mode="json")).execute()
+    params = {"p_church_id": profile["church_id"], "p_class_id": payload.class_id, "p_teacher_id": payload.teacher_id}
+    record = supabase_admin.rpc("assign_teacher", params).execute()
+    if not record.data:
+        raise HTTPException(status_code=404, detail="Teacher or class not found")
+    await invalidate_teacher(payload.teacher_id)
+    await loaders.invalidate_classes(profile["church_id"])
     return record.data[0]
 
 
@@ -144,18 +169,24 @@ async def assign_teacher(payload: TeacherClassAssign, profile=Depends(require_ro
 @router.delete("/classes/{class_id}/teachers/{teacher_id}")
 async def unassign_teacher(class_id: str, teacher_id: str, profile=Depends(require_role("admin"))):
     supabase_admin.table("class_teachers").delete().eq("class_id", class_id).eq("teacher_id", teacher_id).execute()
+    await invalidate_teacher(teacher_id)
+    await loaders.invalidate_classes(profile["church_id"])
     return {"deleted": True}
 
-@router.get("/students")
-async def list_students(profile=Depends(require_role("admin"))):
+@router.get(
+    "/students",
+    response_model=list[StudentOut],
+    dependencies=[Depends(conditional_get("students:{church_id}", roles=("admin",)))],
+)
+async def list_students(fields: str | None = None, profile=Depends(require_role("admin"))):
     res = (
         supabase_admin.table("students")
-        .select("id, church_id, class_id, first_name, last_name, date_of_birth, guardian_name, guardian_contact, allergies, notes, gender, avatar_url")
+        .select(select_columns(StudentOut, fields))
         .eq("church_id", profile["church_id"])
         .order("first_name")
         .execute()
     )
-    return res.data
+    return fieldset_response(res.data, fields)
 
 
 @router.post("/students")
@@ -163,34 +194,49 @@ async def create_student(payload: StudentCreate, profile=Depends(require_role("a
     body = payload.model_dump(mode="json")
     body["church_id"] = profile["church_id"]
     res = supabase_admin.table("students").insert(body).execute()
+    await bump_version(f"students:{profile['church_id']}")
     return res.data[0]
 
 
-@router.get("/students/{student_id}")
+def search_students(church_id: str, q: str, limit: int, class_ids: list[str] | None = None) -> list[dict]:
+    params = {"p_church_id": church_id, "p_query": q, "p_class_ids": class_ids, "p_limit": limit}
+    return supabase_admin.rpc("search_students", params).execute().data
+
+
+@router.get("/students/search", response_model=list[StudentSearchOut])
+async def search_church_students(
+    q: str = Query(min_length=2, max_length=100),
+    limit: int = Query(default=20, ge=1, le=50),
+    profile=Depends(require_role("admin")),
+):
+    return search_students(profile["church_id"], q, limit)
+
+
+@router.get("/students/{student_id}", response_model=StudentOut)
 async def get_student(student_id: str, profile=Depends(require_role("admin"))):
-    res = supabase_admin.table("students").select("*").eq("id", student_id).eq("church_id", profile["church_id"]).single().execute()
+    res = supabase_admin.table("students").select(select_columns(StudentOut)).eq("id", student_id).eq("church_id", profile["church_id"]).single().execute()
     return res.data
 
 
 @router.patch("/students/{student_id}")
 async def update_student(student_id: str, payload: dict, profile=Depends(require_role("admin"))):
     res = supabase_admin.table("students").update(payload).eq("id", student_id).eq("church_id", profile["church_id"]).execute()
+    await bump_version(f"students:{profile['church_id']}")
     return res.data[0]
 
 
 @router.delete("/students/{student_id}")
 async def delete_student(student_id: str, profile=Depends(require_role("admin"))):
     supabase_admin.table("students").delete().eq("id", student_id).eq("church_id", profile["church_id"]).execute()
+    await bump_version(f"students:{profile['church_id']}")
     return {"deleted": True}
 
 
-@router.get("/attendance-reports")
+@router.get("/attendance-reports", response_model=list[AttendancePoint])
 async def attendance_reports(profile=Depends(require_role("admin"))):
-    res = supabase_admin.rpc("get_attendance_analytics", {"p_church_id": profile["church_id"], "p_teacher_id": None}).execute()
-    return res.data
+    return await analytics.attendance_analytics(profile["church_id"])
 
 
-@router.get("/performance-reports")
+@router.get("/performance-reports", response_model=list[PerformancePoint])
 async def performance_reports(profile=Depends(require_role("admin"))):
-    res = supabase_admin.rpc("get_performance_analytics", {"p_church_id": profile["church_id"], "p_teacher_id": None}).execute()
-    return res.data
+    return await analytics.performance_analytics(profile["church_id"])
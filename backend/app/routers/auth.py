@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from jose import jwt
 
+from ..rate_limit import check_rate_limit, client_ip
 from ..schemas.auth import LoginRequest, SignupRequest
 from ..supabase_client import supabase_admin, supabase_anon
 
@@ -7,14 +9,23 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login")
-async def login(payload: LoginRequest):
+async def login(payload: LoginRequest, request: Request):
+    # No user yet, so the per-user budget is keyed on the email being tried from this address;
+    # keying on the email alone would let anyone lock its owner out.
+    await check_rate_limit("login", request, user_id=f"{client_ip(request)}/{payload.email.lower()}")
     auth = supabase_anon.auth.sign_in_with_password({"email": payload.email, "password": payload.password})
     if not auth.session or not auth.user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    profile = supabase_admin.table("users").select("role, church_id").eq("id", auth.user.id).single().execute()
-    if not profile.data:
-        raise HTTPException(status_code=403, detail="Profile missing")
+    # The token comes straight from Supabase Auth, so its hook-added claims can be read without verifying.
+    claims = jwt.get_unverified_claims(auth.session.access_token)
+    if claims.get("user_role") and claims.get("church_id"):
+        role, church_id = claims["user_role"], claims["church_id"]
+    else:
+        profile = supabase_admin.table("users").select("role, church_id").eq("id", auth.user.id).single().execute()
+        if not profile.data:
+            raise HTTPException(status_code=403, detail="Profile missing")
+        role, church_id = profile.data["role"], profile.data["church_id"]
 
     return {
         "access_token": auth.session.access_token,
@@ -22,13 +33,14 @@ async def login(payload: LoginRequest):
         "expires_in": auth.session.expires_in,
         "token_type": "bearer",
         "user_id": auth.user.id,
-        "role": profile.data["role"],
-        "church_id": profile.data["church_id"],
+        "role": role,
+        "church_id": church_id,
     }
 
 
 @router.post("/signup")
-async def signup(payload: SignupRequest):
+async def signup(payload: SignupRequest, request: Request):
+    await check_rate_limit("signup", request)
     if payload.role not in {"admin", "teacher"}:
         raise HTTPException(status_code=400, detail="Role must be admin or teacher")
 
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from ..auth import batch_auth_ctx, get_current_user, verify_supabase_token
+from ..config import settings
+from ..schemas.batch import BatchItemIn, BatchItemOut, BatchRequest
+
+router = APIRouter(tags=["batch"])
+logger = logging.getLogger("app.batch")
+
+
+def _validate_path(path: str) -> None:
+    # Check the path the router will see: percent-decoded and with dot segments resolved.
+    route = posixpath.normpath(unquote(urlsplit(path).path))
+    if not route.startswith(f"{settings.api_prefix}/") or route.startswith(f"{settings.api_prefix}/batch"):
+        raise HTTPException(status_code=400, detail=f"Unsupported batch path: {path}")
+
+
+@router.post("/batch", response_model=list[BatchItemOut])
+async def batch(
+    payload: BatchRequest,
+    request: Request,
+    claims=Depends(verify_supabase_token),
+    user=Depends(get_current_user),
+):
+    if batch_auth_ctx.get() is not None:
+        raise HTTPException(status_code=400, detail="Batches cannot be nested")
+    for item in payload.requests:
+        _validate_path(item.path)
+
+    headers = {"authorization": request.headers.get("authorization", "")}
+    if "x-forwarded-for" in request.headers:
+        headers["x-forwarded-for"] = request.headers["x-forwarded-for"]
+    semaphore = asyncio.Semaphore(1 if payload.sequential else settings.batch_concurrency)
+    # Sub-requests keep the caller's address, so they count against the caller's IP budget.
+    caller = (request.client.host, request.client.port) if request.client else ("127.0.0.1", 123)
+    transport = httpx.ASGITransport(app=request.app, client=caller)
+    token = batch_auth_ctx.set((claims, user))
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+
+            async def dispatch(item: BatchItemIn) -> dict:
+                async with semaphore:
+                    try:
+                        response = await client.request(
+                            item.method,
+                            item.path,
+                            json=item.body if item.method != "GET" else None,
+                            headers=headers,
+                        )
+                    except Exception:
+                        # One failing sub-request must not lose the others' results.
+                        logger.exception("batch sub-request %s %s failed", item.method, item.path)
+                        return {"status": 500, "body": {"detail": "Internal Server Error"}}
+                if "application/json" in response.headers.get("content-type", ""):
+                    return {"status": response.status_code, "body": response.json()}
+                return {"status": response.status_code, "body": response.text or None}
+
+            if payload.sequential:
+                return [await dispatch(item) for item in payload.requests]
+            return await asyncio.gather(*(dispatch(item) for item in payload.requests))
+    finally:
+        batch_auth_ctx.reset(token)
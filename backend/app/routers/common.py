@@ -5,22 +5,70 @@ import smtplib
 from email.mime.text import MIMEText
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
-from ..auth import get_current_profile
+from .. import analytics, loaders
+from ..auth import get_current_profile, get_current_user
+from ..cache import single_flight
+from ..class_membership import teacher_class_ids
 from ..config import settings
+from ..etag import bump_version, conditional_get
+from ..rate_limit import rate_limit
+from ..schemas.common import AttendancePoint, BootstrapOut, ChangesOut, NotificationOut, PerformancePoint
 from ..supabase_client import supabase_admin, supabase_anon
 
 router = APIRouter(prefix="/common", tags=["common"])
 
+DEFAULT_SETTINGS = {
+    "security": {},
+    "notifications": {
+        "emailNotifications": True,
+        "pushNotifications": False,
+        "birthdayReminders": True,
+        "attendanceAlerts": True,
+        "newStudentAlerts": True,
+    },
+    "privacy": {"showEmail": False, "showPhone": True},
+    "advanced": {},
+}
+
 
 @router.get("/me")
 async def me(profile=Depends(get_current_profile)):
     return profile
 
 
+@router.get("/bootstrap", response_model=BootstrapOut)
+async def bootstrap(profile=Depends(get_current_profile)):
+    """Everything the Frontend loads after login, fetched concurrently behind a single auth check."""
+    church_id = profile["church_id"]
+    if profile["role"] == "admin":
+        role_views = [asyncio.to_thread(loaders.dashboard_counts, church_id), loaders.classes(church_id)]
+    else:
+        role_views = [loaders.teacher_view(profile)]
+
+    church, user_settings, notification_rows, birthdays, *views = await asyncio.gather(
+        loaders.church(church_id),
+        asyncio.to_thread(_user_settings, profile["id"]),
+        asyncio.to_thread(_notification_rows, church_id, profile["role"]),
+        _birthdays(church_id, 30, True),
+        *role_views,
+    )
+
+    view = {"dashboard": views[0], "classes": views[1]} if profile["role"] == "admin" else views[0]
+    soon = [b for b in birthdays if b["days_until_birthday"] <= 7]
+    return {
+        "profile": profile,
+        "church": church,
+        "settings": user_settings,
+        "notifications": _with_birthday_items(notification_rows, soon),
+        "birthdays": birthdays,
+        **view,
+    }
+
+
 @router.patch("/me")
-async def update_me(payload: dict, profile=Depends(get_current_profile)):
+async def update_me(payload: dict, profile=Depends(get_current_user)):
     allowed = {"full_name", "phone", "avatar_url"}
     updates = {k: v for k, v in payload.items() if k in allowed}
     if not updates:
@@ -30,8 +78,8 @@ async def update_me(payload: dict, profile=Depends(get_current_profile)):
     return res.data[0] if res.data else {"updated": False}
 
 
-@router.post("/me/change-password")
-async def change_password(payload: dict, profile=Depends(get_current_profile)):
+@router.post("/me/change-password", dependencies=[Depends(rate_limit("change_password"))])
+async def change_password(payload: dict, profile=Depends(get_current_user)):
     current_password = payload.get("current_password")
     new_password = payload.get("new_password")
     if not current_password or not new_password:
@@ -49,26 +97,31 @@ async def change_password(payload: dict, profile=Depends(get_current_profile)):
     return {"updated": True}
 
 
-@router.get("/church")
-async def active_church(profile=Depends(get_current_profile)):
-    church = supabase_admin.table("churches").select("*").eq("id", profile["church_id"]).single().execute()
-    return church.data
+def _user_settings(user_id: str) -> dict:
+    res = (
+        supabase_admin.table("user_settings")
+        .select("security, notifications, privacy, advanced")
+        .eq("user_id", user_id)
+        .maybe_single()
+        .execute()
+    )
+    return res.data if res and res.data else DEFAULT_SETTINGS
 
 
-@router.get("/notifications")
-async def notifications(profile=Depends(get_current_profile)):
+def _notification_rows(church_id: str, role: str) -> list[dict]:
     res = (
         supabase_admin.table("notifications")
         .select("id, title, message, category, created_at")
-        .eq("church_id", profile["church_id"])
-        .or_(f"target_role.eq.all,target_role.eq.{profile['role']}")
+        .eq("church_id", church_id)
+        .or_(f"target_role.eq.all,target_role.eq.{role}")
         .order("created_at", desc=True)
         .limit(20)
         .execute()
     )
-    items = res.data or []
+    return res.data or []
+
 
-    birthdays = await upcoming_birthdays(days=7, include_teachers=True, profile=profile)
+def _with_birthday_items(items: list[dict], birthdays: list[dict]) -> list[dict]:
     for birthday in birthdays[:10]:
         items.append({
             "id": f"birthday-{birthday['id']}",
@@ -81,6 +134,18 @@ async def notifications(profile=Depends(get_current_profile)):
     return items[:20]
 
 
+@router.get("/church", dependencies=[Depends(conditional_get("church:{church_id}"))])
+async def active_church(profile=Depends(get_current_user)):
+    return await loaders.church(profile["church_id"])
+
+
+@router.get("/notifications", response_model=list[NotificationOut])
+async def notifications(profile=Depends(get_current_user)):
+    items = _notification_rows(profile["church_id"], profile["role"])
+    birthdays = await _birthdays(profile["church_id"], days=7, include_teachers=True)
+    return _with_birthday_items(items, birthdays)
+
+
 def _send_email_background(recipients: list[str], subject: str, message: str):
     if not recipients or not settings.smtp_host or not settings.smtp_from_email:
         return
@@ -98,7 +163,7 @@ def _send_email_background(recipients: list[str], subject: str, message: str):
 
 
 @router.post("/notifications")
-async def create_notification(payload: dict, profile=Depends(get_current_profile)):
+async def create_notification(payload: dict, profile=Depends(get_current_user)):
     data = {
         "church_id": profile["church_id"],
         "target_role": payload.get("target_role", "all"),
@@ -118,57 +183,28 @@ async def create_notification(payload: dict, profile=Depends(get_current_profile
     return res.data[0]
 
 
-@router.get("/settings")
-async def get_settings(profile=Depends(get_current_profile)):
-    res = (
-        supabase_admin.table("user_settings")
-        .select("security, notifications, privacy, advanced")
-        .eq("user_id", profile["id"])
-        .maybe_single()
-        .execute()
-    )
-
-    if res.data:
-        return res.data
-
-    return {
-        "security": {},
-        "notifications": {
-            "emailNotifications": True,
-            "pushNotifications": False,
-            "birthdayReminders": True,
-            "attendanceAlerts": True,
-            "newStudentAlerts": True,
-        },
-        "privacy": {"showEmail": False, "showPhone": True},
-        "advanced": {},
-    }
+@router.get("/settings", dependencies=[Depends(conditional_get("settings:{id}"))])
+async def get_settings(profile=Depends(get_current_user)):
+    return _user_settings(profile["id"])
 
 
 @router.patch("/settings/{section}")
-async def update_settings(section: str, payload: dict, profile=Depends(get_current_profile)):
+async def update_settings(section: str, payload: dict, profile=Depends(get_current_user)):
     if section not in {"security", "notifications", "privacy", "advanced"}:
         raise HTTPException(status_code=404, detail="Invalid settings section")
 
-    existing = (
+    # Merge-duplicates upsert only writes the listed columns, so other sections are left as they are.
+    result = (
         supabase_admin.table("user_settings")
-        .select("id")
-        .eq("user_id", profile["id"])
-        .maybe_single()
+        .upsert({"user_id": profile["id"], section: payload}, on_conflict="user_id")
         .execute()
     )
-
-    if existing.data:
-        result = supabase_admin.table("user_settings").update({section: payload}).eq("user_id", profile["id"]).execute()
-        return result.data[0]
-
-    result = supabase_admin.table("user_settings").insert({"user_id": profile["id"], section: payload}).execute()
+    await bump_version(f"settings:{profile['id']}")
     return result.data[0]
 
 
-@router.get("/birthdays")
-async def upcoming_birthdays(days: int = 30, include_teachers: bool = False, profile=Depends(get_current_profile)):
-    res = supabase_admin.rpc("get_upcoming_birthdays", {"p_church_id": profile["church_id"], "p_days": days}).execute()
+def _upcoming_birthdays(church_id: str, days: int = 30, include_teachers: bool = False) -> list[dict]:
+    res = supabase_admin.rpc("get_upcoming_birthdays", {"p_church_id": church_id, "p_days": days}).execute()
     students = [
         {
             "id": row["student_id"],
@@ -185,7 +221,7 @@ async def upcoming_birthdays(days: int = 30, include_teachers: bool = False, pro
     if not include_teachers:
         return students
 
-    teachers = supabase_admin.table("users").select("id, full_name, date_of_birth").eq("church_id", profile["church_id"]).eq("role", "teacher").not_.is_("date_of_birth", "null").execute().data
+    teachers = supabase_admin.table("users").select("id, full_name, date_of_birth").eq("church_id", church_id).eq("role", "teacher").not_.is_("date_of_birth", "null").execute().data
     import datetime as _dt
     today = _dt.date.today()
     teacher_birthdays = []
@@ -212,8 +248,22 @@ async def upcoming_birthdays(days: int = 30, include_teachers: bool = False, pro
     return sorted(students + teacher_birthdays, key=lambda x: x["days_until_birthday"])
 
 
-@router.post("/birthdays/remind-sms")
-async def birthday_sms_reminder(profile=Depends(get_current_profile)):
+async def _birthdays(church_id: str, days: int = 30, include_teachers: bool = False) -> list[dict]:
+    return await single_flight.do(
+        "birthdays",
+        (church_id, days, include_teachers),
+        lambda: asyncio.to_thread(_upcoming_birthdays, church_id, days, include_teachers),
+        ttl=settings.coalesce_ttl_seconds,
+    )
+
+
+@router.get("/birthdays")
+async def upcoming_birthdays(days: int = 30, include_teachers: bool = False, profile=Depends(get_current_user)):
+    return await _birthdays(profile["church_id"], days, include_teachers)
+
+
+@router.post("/birthdays/remind-sms", dependencies=[Depends(rate_limit("sms"))])
+async def birthday_sms_reminder(profile=Depends(get_current_user)):
     if not settings.hubtel_client_id or not settings.hubtel_client_secret or not settings.hubtel_from:
         raise HTTPException(status_code=400, detail="Hubtel SMS settings are not configured")
 
@@ -250,19 +300,48 @@ async def birthday_sms_reminder(profile=Depends(get_current_profile)):
     return {"sent": sent}
 
 
-@router.get("/analytics/attendance")
-async def attendance_analytics(profile=Depends(get_current_profile)):
-    res = supabase_admin.rpc(
-        "get_attendance_analytics",
-        {"p_church_id": profile["church_id"], "p_teacher_id": profile["id"] if profile["role"] == "teacher" else None},
-    ).execute()
-    return res.data
+def _scope_changes_for_teacher(changes: list[dict], profile: dict, class_ids: list[str]) -> tuple[list[dict], bool]:
+    """Drop rows outside the teacher's classes; rows that left them become tombstones."""
+    scoped = []
+    membership_changed = False
+    for change in changes:
+        row = change["row"] or {}
+        if change["table"] == "class_teachers" and row.get("teacher_id") == profile["id"]:
+            membership_changed = True
+        visible = change["id"] in class_ids if change["table"] == "classes" else row.get("class_id") in class_ids
+        if not visible:
+            if change["op"] == "insert":
+                continue
+            change = {**change, "op": "delete"}
+        scoped.append(change)
+    return scoped, membership_changed
+
+
+@router.get("/changes", response_model=ChangesOut)
+async def changes(
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=500, ge=1, le=1000),
+    profile=Depends(get_current_user),
+):
+    feed = supabase_admin.rpc("get_changes", {"p_church_id": profile["church_id"], "p_since": since, "p_limit": limit}).execute().data
+
+    # A fresh client, or one whose cursor predates compaction, must refetch in full and resume from "latest".
+    if since == 0 or since < feed["compacted_through"]:
+        return {"cursor": feed["latest"], "has_more": False, "reset": True, "changes": []}
+
+    items = feed["changes"]
+    reset = False
+    if profile["role"] == "teacher":
+        items, reset = _scope_changes_for_teacher(items, profile, await teacher_class_ids(profile["id"], profile["church_id"]))
+    items = [{**change, "row": None} if change["op"] == "delete" else change for change in items]
+    return {"cursor": feed["cursor"], "has_more": feed["has_more"], "reset": reset, "changes": items}
+
+
+@router.get("/analytics/attendance", response_model=list[AttendancePoint])
+async def attendance_analytics(profile=Depends(get_current_user)):
+    return await analytics.attendance_analytics(profile["church_id"], profile["id"] if profile["role"] == "teacher" else None)
 
 
-@router.get("/analytics/performance")
-async def performance_analytics(profile=Depends(get_current_profile)):
-    res = supabase_admin.rpc(
-        "get_performance_analytics",
-        {"p_church_id": profile["church_id"], "p_teacher_id": profile["id"] if profile["role"] == "teacher" else None},
-    ).execute()
-    return res.data
+@router.get("/analytics/performance", response_model=list[PerformancePoint])
+async def performance_analytics(profile=Depends(get_current_user)):
+    return await analytics.performance_analytics(profile["church_id"], profile["id"] if profile["role"] == "teacher" else None)
@@ -0,0 +1,23 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from .. import profiling
+from ..auth import require_role
+from ..schemas.profiles import ProfileOut
+
+router = APIRouter(prefix="/admin/profiles", tags=["profiling"])
+
+
+@router.get("", response_model=list[ProfileOut])
+async def list_profiles(limit: int = Query(default=50, ge=1, le=200), profile=Depends(require_role("admin"))):
+    return await asyncio.to_thread(profiling.list_profiles, profile["church_id"], limit)
+
+
+@router.get("/{profile_id}")
+async def download_profile(profile_id: str, profile=Depends(require_role("admin"))):
+    path = await asyncio.to_thread(profiling.profile_html, profile["church_id"], profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/html", filename=path.name)
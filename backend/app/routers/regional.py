@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..auth import require_role
+from ..cache import cache
+from ..config import settings
+from ..schemas.regional import RegionalAnalyticsOut
+from ..supabase_client import supabase_admin
+
+router = APIRouter(prefix="/regional", tags=["regional"])
+
+
+def _load_rollup(region: str, date_from: date, date_to: date) -> dict:
+    params = {"p_region": region, "p_from": str(date_from), "p_to": str(date_to)}
+    rows = supabase_admin.rpc("get_regional_analytics", params).execute().data
+    branches = [row for row in rows if row["church_id"] is not None]
+    totals = next(row for row in rows if row["church_id"] is None)
+    return {
+        "region": region,
+        "date_from": str(date_from),
+        "date_to": str(date_to),
+        "totals": {
+            "branches": len(branches),
+            "sessions": totals["sessions"] or 0,
+            "present_count": totals["present_count"] or 0,
+            "total_count": totals["total_count"] or 0,
+            "attendance_rate": totals["attendance_rate"],
+            "tests": totals["tests"] or 0,
+            "avg_percent": totals["avg_percent"],
+        },
+        "branches": branches,
+    }
+
+
+@router.get("/analytics", response_model=RegionalAnalyticsOut)
+async def regional_analytics(
+    region: str | None = None,
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    profile=Depends(require_role("admin")),
+):
+    # Branch admins see their own church; the rollup covers other branches, so it needs a coordinator grant.
+    granted_region = profile["coordinator_region"]
+    if not granted_region:
+        raise HTTPException(status_code=403, detail="Not a regional coordinator")
+    region = region or granted_region
+    if region != granted_region:
+        raise HTTPException(status_code=403, detail="Not authorized for this region")
+
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=settings.regional_default_days)
+    if date_from > date_to or (date_to - date_from).days > settings.regional_max_days:
+        raise HTTPException(status_code=400, detail="Invalid date range")
+
+    # Keyed by the current day too, so a cached rollup never outlives the day it was computed on.
+    return await cache.get_or_load(
+        f"regional:{region}:{date_from}:{date_to}:{date.today()}",
+        lambda: asyncio.to_thread(_load_rollup, region, date_from, date_to),
+        ttl=settings.regional_cache_ttl_seconds,
+        tags=[f"region:{region}"],
+        name="regional",
+    )
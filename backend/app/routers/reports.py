@@ -0,0 +1,42 @@
+import asyncio
+import importlib.util
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import RedirectResponse
+
+from .. import jobs
+from ..auth import require_role
+from ..schemas.reports import JobOut, ReportCardsRequest
+
+router = APIRouter(prefix="/admin", tags=["reports"])
+
+
+async def _own_job(job_id: str, profile: dict) -> dict:
+    job = await jobs.get_job(job_id)
+    if not job or job["church_id"] != profile["church_id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/reports/report-cards", response_model=JobOut, status_code=202)
+async def create_report_cards(payload: ReportCardsRequest, profile: dict = Depends(require_role("admin"))):
+    if payload.date_from > payload.date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if payload.format == "pdf" and importlib.util.find_spec("weasyprint") is None:
+        raise HTTPException(status_code=400, detail="PDF output is not available on this server")
+    return await jobs.enqueue_report_cards(
+        profile, payload.class_ids, str(payload.date_from), str(payload.date_to), payload.format
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: str, profile: dict = Depends(require_role("admin"))):
+    return await _own_job(job_id, profile)
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_job(job_id: str, profile: dict = Depends(require_role("admin"))):
+    job = await _own_job(job_id, profile)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return RedirectResponse(await asyncio.to_thread(jobs.signed_url, job))
@@ -3,8 +3,9 @@ import uuid
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 
-from ..auth import get_current_profile
+from ..auth import get_current_user
 from ..config import settings
+from ..etag import bump_version
 from ..supabase_client import supabase_admin
 
 router = APIRouter(prefix="/storage", tags=["storage"])
@@ -21,7 +22,7 @@ def _validate_image(file: UploadFile, content: bytes):
 
 
 @router.post("/students/{student_id}/avatar")
-async def upload_student_avatar(student_id: str, file: UploadFile = File(...), profile=Depends(get_current_profile)):
+async def upload_student_avatar(student_id: str, file: UploadFile = File(...), profile=Depends(get_current_user)):
     content = await file.read()
     _validate_image(file, content)
 
@@ -39,12 +40,13 @@ async def upload_student_avatar(student_id: str, file: UploadFile = File(...), p
     supabase_admin.table("students").update({"avatar_url": public_url}).eq("id", student_id).eq(
         "church_id", profile["church_id"]
     ).execute()
+    await bump_version(f"students:{profile['church_id']}")
 
     return {"path": filename, "avatar_url": public_url}
 
 
 @router.post("/users/me/avatar")
-async def upload_user_avatar(file: UploadFile = File(...), profile=Depends(get_current_profile)):
+async def upload_user_avatar(file: UploadFile = File(...), profile=Depends(get_current_user)):
     content = await file.read()
     _validate_image(file, content)
 
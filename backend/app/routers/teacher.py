@@ -1,50 +1,60 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 
+from .. import loaders
 from ..auth import require_role
-from ..schemas.teacher import AttendanceSessionCreate, PerformanceTestCreate, StudentNoteIn
+from ..class_membership import assigned_class_ids, teacher_class_ids
+from ..etag import bump_version, conditional_get
+from ..schemas.admin import StudentOut, StudentSearchOut
+from ..schemas.teacher import AttendanceSessionCreate, PerformanceTestCreate, StudentNoteIn, TeacherClassOut
+from ..serialization import fieldset_response, select_columns
 from ..supabase_client import supabase_admin
+from .admin import search_students
 
 router = APIRouter(prefix="/teacher", tags=["teacher"])
 
 
+async def _require_class(class_id: str, profile: dict) -> None:
+    if class_id not in await assigned_class_ids(profile["id"]):
+        raise HTTPException(status_code=403, detail="Not assigned to this class")
+
+
 @router.get("/dashboard")
 async def dashboard(profile=Depends(require_role("teacher"))):
-    teacher_id = profile["id"]
-    classes = (
-        supabase_admin.table("class_teachers")
-        .select("class_id, classes(id, name, age_group)")
-        .eq("teacher_id", teacher_id)
-        .execute()
-    )
-    class_ids = [row["class_id"] for row in classes.data]
+    class_ids = await teacher_class_ids(profile["id"], profile["church_id"])
     students_count = 0
     if class_ids:
         students = supabase_admin.table("students").select("id", count="exact").in_("class_id", class_ids).execute()
         students_count = students.count or 0
 
-    return {"classes": [row["classes"] for row in classes.data], "students": students_count}
+    return {"classes": loaders.classes_by_id(class_ids, "id, name, age_group"), "students": students_count}
 
 
-@router.get("/classes")
+@router.get("/classes", response_model=list[TeacherClassOut])
 async def my_classes(profile=Depends(require_role("teacher"))):
-    res = (
-        supabase_admin.table("class_teachers")
-        .select("class_id, classes(id, name, age_group, description)")
-        .eq("teacher_id", profile["id"])
-        .execute()
-    )
-    return [row["classes"] for row in res.data]
-
-
-@router.get("/students")
-async def my_students(profile=Depends(require_role("teacher"))):
-    class_links = supabase_admin.table("class_teachers").select("class_id").eq("teacher_id", profile["id"]).execute()
-    class_ids = [row["class_id"] for row in class_links.data]
+    class_ids = await teacher_class_ids(profile["id"], profile["church_id"])
+    return loaders.classes_by_id(class_ids, select_columns(TeacherClassOut))
+
+
+@router.get(
+    "/students",
+    response_model=list[StudentOut],
+    dependencies=[Depends(conditional_get("students:{church_id}", "classes:{church_id}", roles=("teacher",)))],
+)
+async def my_students(fields: str | None = None, profile=Depends(require_role("teacher"))):
+    class_ids = await teacher_class_ids(profile["id"], profile["church_id"])
+    return fieldset_response(loaders.students_in_classes(class_ids, fields), fields)
+
+
+@router.get("/students/search", response_model=list[StudentSearchOut])
+async def search_my_students(
+    q: str = Query(min_length=2, max_length=100),
+    limit: int = Query(default=20, ge=1, le=50),
+    profile=Depends(require_role("teacher")),
+):
+    class_ids = await teacher_class_ids(profile["id"], profile["church_id"])
     if not class_ids:
         return []
-
-    students = supabase_admin.table("students").select("*").in_("class_id", class_ids).order("first_name").execute()
-    return students.data
+    return search_students(profile["church_id"], q, limit, class_ids)
 
 
 @router.get("/students/{student_id}")
@@ -62,13 +72,18 @@ async def student_profile(student_id: str, profile=Depends(require_role("teacher
 
 @router.post("/attendance")
 async def record_attendance(payload: AttendanceSessionCreate, profile=Depends(require_role("teacher"))):
+    await _require_class(payload.class_id, profile)
     session = (
         supabase_admin.table("attendance_sessions")
         .insert({"class_id": payload.class_id, "session_date": str(payload.session_date), "recorded_by": profile["id"], "church_id": profile["church_id"]})
         .execute()
     )
     attendance_session_id = session.data[0]["id"]
-    rows = [{"attendance_session_id": attendance_session_id, **item.model_dump()} for item in payload.students]
+    # session_date is the partition key of attendance_records, so each record carries it.
+    rows = [
+        {"attendance_session_id": attendance_session_id, "session_date": str(payload.session_date), **item.model_dump()}
+        for item in payload.students
+    ]
     supabase_admin.table("attendance_records").insert(rows).execute()
     return {"attendance_session_id": attendance_session_id, "records": len(rows)}
 
@@ -84,13 +99,14 @@ async def attendance_history(class_id: str | None = None, profile=Depends(requir
 
 @router.post("/performance")
 async def record_performance(payload: PerformanceTestCreate, profile=Depends(require_role("teacher"))):
+    await _require_class(payload.class_id, profile)
     test = (
         supabase_admin.table("performance_tests")
         .insert({"class_id": payload.class_id, "title": payload.title, "taken_on": str(payload.taken_on), "recorded_by": profile["id"], "church_id": profile["church_id"]})
         .execute()
     )
     test_id = test.data[0]["id"]
-    rows = [{"test_id": test_id, **s.model_dump()} for s in payload.scores]
+    rows = [{"test_id": test_id, "taken_on": str(payload.taken_on), **s.model_dump()} for s in payload.scores]
     supabase_admin.table("performance_scores").insert(rows).execute()
     return {"test_id": test_id, "scores": len(rows)}
 
@@ -116,12 +132,12 @@ async def add_student_note(payload: StudentNoteIn, profile=Depends(require_role(
 
 @router.delete("/students/{student_id}")
 async def remove_student(student_id: str, profile=Depends(require_role("teacher"))):
-    class_links = supabase_admin.table("class_teachers").select("class_id").eq("teacher_id", profile["id"]).execute()
-    class_ids = [row["class_id"] for row in class_links.data]
+    class_ids = await assigned_class_ids(profile["id"])
     if not class_ids:
         return {"deleted": False}
 
     supabase_admin.table("students").delete().eq("id", student_id).eq("church_id", profile["church_id"]).in_("class_id", class_ids).execute()
+    await bump_version(f"students:{profile['church_id']}")
     return {"deleted": True}
 
 
@@ -15,7 +15,10 @@ class TeacherCreate(BaseModel):
 class TeacherOut(BaseModel):
     id: str
     full_name: str
-    email: str = Field(pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+    email: str
+    phone: Optional[str] = None
+    avatar_url: Optional[str] = None
+    date_of_birth: Optional[date] = None
     role: str
     church_id: str
 
@@ -26,12 +29,35 @@ class ClassCreate(BaseModel):
     age_group: str
 
 
+class ClassTeacherOut(BaseModel):
+    teacher_id: str
+
+
 class ClassOut(BaseModel):
     id: str
     name: str
-    description: Optional[str]
+    description: Optional[str] = None
     age_group: str
     church_id: str
+    class_teachers: list[ClassTeacherOut] = []
+
+
+class ClassOverviewTeacherOut(BaseModel):
+    id: str
+    full_name: str
+
+
+class ClassOverviewOut(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    age_group: str
+    student_count: int
+    teachers: list[ClassOverviewTeacherOut] = []
+    last_session_date: Optional[date] = None
+    present_count: int
+    total_count: int
+    attendance_rate: Optional[float] = None
 
 
 class StudentCreate(BaseModel):
@@ -48,16 +74,28 @@ class StudentCreate(BaseModel):
 
 class StudentOut(BaseModel):
     id: str
+    church_id: str
     class_id: str
     first_name: str
     last_name: str
     date_of_birth: date
     guardian_name: str
     guardian_contact: str
-    allergies: Optional[str]
-    notes: Optional[str]
-    gender: Optional[str]
-    avatar_url: Optional[str]
+    allergies: Optional[str] = None
+    notes: Optional[str] = None
+    gender: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+
+class StudentSearchOut(BaseModel):
+    id: str
+    class_id: str
+    first_name: str
+    last_name: str
+    guardian_name: str
+    guardian_contact: str
+    avatar_url: Optional[str] = None
+    rank: float
 
 
 class TeacherClassAssign(BaseModel):
@@ -0,0 +1,21 @@
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field
+
+from ..config import settings
+
+
+class BatchItemIn(BaseModel):
+    method: Literal["GET", "POST", "PATCH", "PUT", "DELETE"]
+    path: str
+    body: Any = None
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchItemIn] = Field(min_length=1, max_length=settings.batch_max_requests)
+    sequential: bool = False
+
+
+class BatchItemOut(BaseModel):
+    status: int
+    body: Any = None
@@ -1,4 +1,6 @@
 from datetime import date
+from typing import Any
+
 from pydantic import BaseModel, Field
 
 
@@ -30,9 +32,34 @@ class AttendancePoint(BaseModel):
     session_date: date
     present_count: int
     total_count: int
-    attendance_rate: float
+    attendance_rate: float | None
 
 
 class PerformancePoint(BaseModel):
     taken_on: date
-    avg_percent: float
+    avg_percent: float | None
+
+
+class BootstrapOut(BaseModel):
+    profile: dict[str, Any]
+    church: dict[str, Any]
+    settings: dict[str, Any]
+    notifications: list[NotificationOut]
+    birthdays: list[dict[str, Any]]
+    classes: list[dict[str, Any]]
+    dashboard: dict[str, int] | None = None
+    students: list[dict[str, Any]] | None = None
+
+
+class ChangeOut(BaseModel):
+    table: str
+    id: str
+    op: str
+    row: dict[str, Any] | None = None
+
+
+class ChangesOut(BaseModel):
+    cursor: int
+    has_more: bool
+    reset: bool
+    changes: list[ChangeOut]
@@ -0,0 +1,14 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class ProfileOut(BaseModel):
+    id: str
+    request_id: str
+    method: str
+    path: str
+    status_code: int
+    duration_ms: float
+    trigger: Literal["header", "sampled"]
+    created_at: float
@@ -0,0 +1,35 @@
+from datetime import date
+
+from pydantic import BaseModel
+
+
+class RegionalBranchOut(BaseModel):
+    church_id: str
+    name: str
+    branch_name: str
+    district: str | None = None
+    area: str | None = None
+    sessions: int
+    present_count: int
+    total_count: int
+    attendance_rate: float | None = None
+    tests: int
+    avg_percent: float | None = None
+
+
+class RegionalTotalsOut(BaseModel):
+    branches: int
+    sessions: int
+    present_count: int
+    total_count: int
+    attendance_rate: float | None = None
+    tests: int
+    avg_percent: float | None = None
+
+
+class RegionalAnalyticsOut(BaseModel):
+    region: str
+    date_from: date
+    date_to: date
+    totals: RegionalTotalsOut
+    branches: list[RegionalBranchOut]
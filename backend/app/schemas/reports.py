@@ -0,0 +1,25 @@
+from datetime import date, datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class ReportCardsRequest(BaseModel):
+    class_ids: list[str] | None = None
+    date_from: date
+    date_to: date
+    format: Literal["html", "pdf"] = "html"
+
+
+class JobOut(BaseModel):
+    id: str
+    type: str
+    status: Literal["queued", "running", "completed", "failed"]
+    format: str
+    date_from: date
+    date_to: date
+    total: int
+    done: int
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
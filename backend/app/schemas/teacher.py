@@ -33,3 +33,10 @@ class PerformanceTestCreate(BaseModel):
 class StudentNoteIn(BaseModel):
     student_id: str
     note: str
+
+
+class TeacherClassOut(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    age_group: str
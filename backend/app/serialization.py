@@ -0,0 +1,32 @@
+from typing import Any, get_args, get_origin
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _column(name: str, annotation: Any) -> str:
+    if get_origin(annotation) is list:
+        (item,) = get_args(annotation)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return f"{name}({', '.join(item.model_fields)})"
+    return name
+
+
+def select_columns(model: type[BaseModel], fields: str | None = None) -> str:
+    """Build a PostgREST select list from a response model, optionally narrowed by ?fields=."""
+    names = list(model.model_fields)
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in model.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        names = list(dict.fromkeys(requested))
+    return ", ".join(_column(name, model.model_fields[name].annotation) for name in names)
+
+
+def fieldset_response(rows: list[dict[str, Any]], fields: str | None = None) -> Any:
+    """Sparse rows skip the route's response_model, which would reject the missing fields."""
+    if fields:
+        return ORJSONResponse(rows)
+    return rows
@@ -0,0 +1,820 @@
+"""In-memory stand-in for the Supabase HTTP APIs the backend calls.
+
+``FakeSupabase`` answers PostgREST table and RPC requests, GoTrue password login, admin user
+creation and JWKS, and Storage uploads and signed URLs. It works on the wire format, so the real
+supabase-py clients, JWT verification and query building run unchanged. ``serve()`` routes every
+httpx request for the fake host here, after sleeping for the configured upstream latency.
+
+Only the PostgREST features the routers use are implemented; an unsupported request answers
+``501`` so a new query shows up as a load-test error rather than passing silently.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import unquote
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+PASSWORD = "load-test-password"
+KEY_ID = "load-test-key"
+
+# Embedded selects such as ``students(count)``: (table, embedded table) -> (foreign-key column, to-many).
+RELATIONSHIPS = {
+    ("classes", "class_teachers"): ("class_id", True),
+    ("classes", "students"): ("class_id", True),
+    ("students", "student_notes"): ("student_id", True),
+    ("attendance_sessions", "attendance_records"): ("attendance_session_id", True),
+    ("performance_tests", "performance_scores"): ("test_id", True),
+    ("students", "classes"): ("class_id", False),
+    ("class_teachers", "users"): ("teacher_id", False),
+    ("student_notes", "users"): ("author_id", False),
+}
+
+UNIQUE_KEYS = {
+    "users": [("email",)],
+    "class_teachers": [("class_id", "teacher_id")],
+    "attendance_sessions": [("class_id", "session_date")],
+    "attendance_records": [("attendance_session_id", "student_id")],
+    "performance_scores": [("test_id", "student_id")],
+    "user_settings": [("user_id",)],
+}
+
+# The 12 most recent session/test dates, like the analytics RPCs in schema.sql.
+ANALYTICS_POINTS = 12
+
+# Tables with a record_change() trigger in schema.sql.
+CHANGE_LOG_TABLES = {"students", "classes", "class_teachers", "attendance_sessions", "performance_tests"}
+
+# Columns referencing users with ``on delete restrict``: a user they point at cannot be removed.
+USER_RESTRICT = [("attendance_sessions", "recorded_by"), ("performance_tests", "recorded_by"), ("student_notes", "author_id")]
+
+# remove_teacher purges revoked_users rows older than the longest access-token lifetime.
+REVOCATION_RETENTION = timedelta(days=7)
+
+
+class FakeError(Exception):
+    def __init__(self, status: int, message: str, details: str | None = None, code: str = "FAKE"):
+        super().__init__(message)
+        self.status = status
+        self.body = {"code": code, "message": message, "details": details, "hint": None}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(value: str) -> list[str]:
+    """Split on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, ""
+    for char in value:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current:
+        parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _coerce(raw: str, stored):
+    if isinstance(stored, bool):
+        return raw == "true"
+    if isinstance(stored, (int, float)):
+        return float(raw)
+    return raw
+
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition(".")
+    value = row.get(column)
+    if op == "is":
+        result = value is None if raw == "null" else value is (raw == "true")
+    elif op == "in":
+        options = [option.strip('"') for option in _split_top_level(raw.strip("()"))]
+        result = value is not None and str(value) in options
+    elif value is None:
+        result = False
+    elif op in ("like", "ilike"):
+        pattern = raw.replace("*", "%")
+        needle, text = pattern.strip("%"), str(value)
+        if op == "ilike":
+            needle, text = needle.lower(), text.lower()
+        result = needle in text
+    else:
+        other = _coerce(raw, value)
+        if not isinstance(value, (bool, int, float)):
+            value = str(value)
+        comparisons = {
+            "eq": value == other,
+            "neq": value != other,
+            "gt": value > other,
+            "gte": value >= other,
+            "lt": value < other,
+            "lte": value <= other,
+        }
+        if op not in comparisons:
+            raise FakeError(501, f"Unsupported filter operator: {op}")
+        result = comparisons[op]
+    return not result if negate else result
+
+
+def _logic(row: dict, expression: str, combine) -> bool:
+    """``or=(a.eq.1,b.eq.2)``: each term is ``column.operator.value``."""
+    results = []
+    for term in _split_top_level(expression.strip("()")):
+        column, _, rest = term.partition(".")
+        results.append(_matches(row, column, rest))
+    return combine(results)
+
+
+class FakeSupabase:
+    def __init__(self, host: str = "supabase.load-test", latency_ms: float = 15.0, jitter_ms: float = 5.0, seed: int = 7):
+        self.host = host
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tables: dict[str, list[dict]] = defaultdict(list)
+        self.objects: dict[str, bytes] = {}
+        self.calls: dict[str, int] = defaultdict(int)
+        # Running per-session [present, total] and per-test [percent sum, count], kept on insert so the
+        # analytics RPCs stay cheap, as the indexed SQL versions are.
+        self._session_totals: dict[str, list] = defaultdict(lambda: [0, 0])
+        self._test_totals: dict[str, list] = defaultdict(lambda: [0.0, 0])
+        self._unique: dict[tuple, set] = defaultdict(set)
+        # Every request is its own transaction; change_log rows carry its id, as pg_current_xact_id() does.
+        self._xact = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._signing_key = self._private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        public_key = self._private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        self._jwks = [{**jwk.construct(public_key, "RS256").to_dict(), "kid": KEY_ID, "alg": "RS256", "use": "sig"}]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}"
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(self.latency_ms + jitter, 0.0) / 1000
+
+    # Seeding
+
+    def seed(self, churches: int, classes_per_church: int, students_per_class: int, weeks: int, tests: int) -> None:
+        """Create churches with one admin, one teacher per class, students and attendance/score history.
+
+        The admin of the first church in each region is that region's coordinator.
+        """
+        rng = random.Random(42)
+        today = date.today()
+        last_sunday = today - timedelta(days=(today.weekday() + 1) % 7)
+        for c in range(churches):
+            church = self._insert_row("churches", {
+                "name": "Kindred Kids",
+                "branch_name": f"Branch {c}",
+                "location": f"Town {c}",
+                "region": f"Region {c % 3}",
+                "district": f"District {c % 5}",
+                "area": None,
+            })
+            church_id = church["id"]
+            admin = self._insert_user(church_id, "admin", f"admin{c}@load.test", f"Admin {c}")
+            if not any(row["region"] == church["region"] for row in self.tables["regional_coordinators"]):
+                self._insert_row("regional_coordinators", {"user_id": admin["id"], "region": church["region"]})
+            for n in range(10):
+                self._insert_row("notifications", {
+                    "church_id": church_id,
+                    "target_role": ("all", "teacher", "admin")[n % 3],
+                    "category": "general",
+                    "title": f"Notice {n}",
+                    "message": "Service times have changed for the holiday weekend.",
+                })
+            for k in range(classes_per_church):
+                klass = self._insert_row("classes", {
+                    "church_id": church_id,
+                    "name": f"Class {k:02d}",
+                    "description": None,
+                    "age_group": f"{3 + k % 10}-{4 + k % 10}",
+                })
+                teacher = self._insert_user(
+                    church_id, "teacher", f"teacher{c}-{k}@load.test", f"Teacher {c}-{k}",
+                    date_of_birth=str(date(1990, 1, 1) + timedelta(days=rng.randrange(3650))),
+                )
+                self._insert_row("class_teachers", {"church_id": church_id, "class_id": klass["id"], "teacher_id": teacher["id"]})
+                students = [
+                    self._insert_row("students", {
+                        "church_id": church_id,
+                        "class_id": klass["id"],
+                        "first_name": f"Child{s}",
+                        "last_name": f"Family{k}-{s // 2}",
+                        "date_of_birth": str(today - timedelta(days=365 * 4 + rng.randrange(365 * 8))),
+                        "guardian_name": f"Guardian {s // 2}",
+                        "guardian_contact": f"+23324{c:02d}{k:02d}{s:03d}",
+                        "allergies": None,
+                        "notes": None,
+                        "gender": ("female", "male")[s % 2],
+                        "avatar_url": None,
+                    })
+                    for s in range(students_per_class)
+                ]
+                # History stops the week before the last Sunday, which the attendance burst records.
+                for w in range(1, weeks + 1):
+                    session_date = str(last_sunday - timedelta(weeks=w))
+                    session = self._insert_row("attendance_sessions", {
+                        "church_id": church_id, "class_id": klass["id"], "session_date": session_date, "recorded_by": teacher["id"],
+                    })
+                    for student in students:
+                        self._insert_row("attendance_records", {
+                            "attendance_session_id": session["id"], "session_date": session_date,
+                            "student_id": student["id"], "present": rng.random() < 0.85, "notes": None,
+                        })
+                for t in range(tests):
+                    taken_on = str(last_sunday - timedelta(weeks=2 * t + 1))
+                    test = self._insert_row("performance_tests", {
+                        "church_id": church_id, "class_id": klass["id"], "title": f"Test {t}",
+                        "taken_on": taken_on, "recorded_by": teacher["id"],
+                    })
+                    for student in students:
+                        self._insert_row("performance_scores", {
+                            "test_id": test["id"], "taken_on": taken_on, "student_id": student["id"],
+                            "score": float(rng.randint(8, 20)), "max_score": 20.0, "notes": None,
+                        })
+
+    def _insert_user(self, church_id: str, role: str, email: str, full_name: str, date_of_birth: str | None = None) -> dict:
+        return self._insert_row("users", {
+            "id": str(uuid.uuid4()), "full_name": full_name, "email": email, "phone": None,
+            "date_of_birth": date_of_birth, "avatar_url": None, "role": role, "church_id": church_id,
+        })
+
+    def _insert_row(self, table: str, values: dict) -> dict:
+        row = {"id": str(uuid.uuid4()), **values}
+        if table not in ("class_teachers", "attendance_records", "performance_scores", "user_settings", "revoked_users", "regional_coordinators"):
+            row.setdefault("created_at", _now())
+        keys = [((table, columns), tuple(row.get(column) for column in columns)) for columns in UNIQUE_KEYS.get(table, [])]
+        for index, key in keys:
+            if key in self._unique[index]:
+                raise FakeError(409, f"duplicate key value violates unique constraint on {table}{index[1]}", code="23505")
+        for index, key in keys:
+            self._unique[index].add(key)
+        self.tables[table].append(row)
+        if table == "attendance_records":
+            totals = self._session_totals[row["attendance_session_id"]]
+            totals[0] += bool(row["present"])
+            totals[1] += 1
+        elif table == "performance_scores" and row["max_score"]:
+            totals = self._test_totals[row["test_id"]]
+            totals[0] += row["score"] * 100 / row["max_score"]
+            totals[1] += 1
+        self._log_change(table, "insert", row)
+        return row
+
+    def _delete_rows(self, table: str, rows: list[dict]) -> None:
+        ids = {id(row) for row in rows}
+        self.tables[table] = [row for row in self.tables[table] if id(row) not in ids]
+        for columns in UNIQUE_KEYS.get(table, []):
+            self._unique[(table, columns)] -= {tuple(row.get(column) for column in columns) for row in rows}
+        for row in rows:
+            self._log_change(table, "delete", row)
+
+    def _log_change(self, table: str, op: str, row: dict) -> None:
+        if table in CHANGE_LOG_TABLES and row.get("church_id"):
+            log = self.tables["change_log"]
+            log.append({
+                "id": len(log) + 1, "church_id": row["church_id"], "table_name": table, "row_id": row["id"],
+                "op": op, "data": dict(row), "xact_id": self._xact,
+            })
+
+    def users(self, role: str | None = None) -> list[dict]:
+        return [user for user in self.tables["users"] if role is None or user["role"] == role]
+
+    def coordinator_region(self, user_id: str) -> str | None:
+        return next((row["region"] for row in self.tables["regional_coordinators"] if row["user_id"] == user_id), None)
+
+    # HTTP dispatch
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = unquote(request.url.path)
+        try:
+            with self._lock:
+                self._xact += 1
+                if path.startswith("/rest/v1/rpc/"):
+                    name = path.rsplit("/", 1)[1]
+                    self.calls[f"rpc:{name}"] += 1
+                    return self._json(200, self._rpc(name, json.loads(request.content or b"{}")))
+                if path.startswith("/rest/v1/"):
+                    table = path.removeprefix("/rest/v1/")
+                    self.calls[f"{request.method} {table}"] += 1
+                    return self._rest(request, table)
+                if path.startswith("/auth/v1/"):
+                    self.calls[f"auth:{path.removeprefix('/auth/v1/')}"] += 1
+                    return self._auth(request, path.removeprefix("/auth/v1/"))
+                if path.startswith("/storage/v1/"):
+                    self.calls["storage"] += 1
+                    return self._storage(request, path.removeprefix("/storage/v1/"))
+            raise FakeError(404, f"No fake route for {request.method} {path}")
+        except FakeError as exc:
+            return self._json(exc.status, exc.body)
+
+    @staticmethod
+    def _json(status: int, body, headers: dict | None = None) -> httpx.Response:
+        return httpx.Response(status, content=json.dumps(body, default=str).encode(), headers={"content-type": "application/json", **(headers or {})})
+
+    # PostgREST
+
+    def _rest(self, request: httpx.Request, table: str) -> httpx.Response:
+        params = list(request.url.params.multi_items())
+        prefer = request.headers.get("prefer", "")
+        single = "vnd.pgrst.object" in request.headers.get("accept", "")
+        rows = self._filter(self.tables[table], params)
+
+        if request.method == "GET" or request.method == "HEAD":
+            total = len(rows)
+            rows = self._order(rows, dict(params).get("order"))
+            offset = int(dict(params).get("offset", 0))
+            limit = dict(params).get("limit")
+            rows = rows[offset: offset + int(limit) if limit else None]
+            result = [self._project(table, row, dict(params).get("select", "*")) for row in rows]
+        elif request.method == "POST":
+            body = json.loads(request.content)
+            payload = body if isinstance(body, list) else [body]
+            if "merge-duplicates" in prefer:
+                result = [self._upsert(table, values, dict(params).get("on_conflict", "id")) for values in payload]
+            else:
+                result = [self._insert_row(table, values) for values in payload]
+            total = len(result)
+        elif request.method == "PATCH":
+            updates = json.loads(request.content)
+            for row in rows:
+                row.update(updates)
+                self._log_change(table, "update", row)
+            result, total = [dict(row) for row in rows], len(rows)
+        elif request.method == "DELETE":
+            self._delete_rows(table, rows)
+            result, total = rows, len(rows)
+        else:
+            raise FakeError(501, f"Unsupported method {request.method}")
+
+        headers = {}
+        if "count=" in prefer:
+            headers["content-range"] = f"0-{max(len(result) - 1, 0)}/{total}" if result else f"*/{total}"
+        if single:
+            if len(result) != 1:
+                raise FakeError(406, "JSON object requested, multiple (or no) rows returned", f"The result contains {len(result)} rows", "PGRST116")
+            return self._json(200, result[0], headers)
+        if "return=minimal" in prefer and request.method != "GET":
+            return self._json(201, [], headers)
+        return self._json(201 if request.method == "POST" else 200, result, headers)
+
+    def _filter(self, rows: list[dict], params: list[tuple[str, str]]) -> list[dict]:
+        reserved = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+        filters = [(key, value) for key, value in params if key not in reserved]
+        if not filters:
+            return list(rows)
+        result = []
+        for row in rows:
+            for key, value in filters:
+                if key == "or":
+                    ok = _logic(row, value, any)
+                elif key == "and":
+                    ok = _logic(row, value, all)
+                else:
+                    ok = _matches(row, key, value)
+                if not ok:
+                    break
+            else:
+                result.append(row)
+        return result
+
+    @staticmethod
+    def _order(rows: list[dict], order: str | None) -> list[dict]:
+        if not order:
+            return rows
+        for term in reversed(order.split(",")):
+            column, *modifiers = term.split(".")
+            descending = "desc" in modifiers
+            rows = sorted(rows, key=lambda row: (row.get(column) is None, row.get(column) or ""), reverse=descending)
+        return rows
+
+    def _project(self, table: str, row: dict, select: str) -> dict:
+        result = {}
+        for item in _split_top_level(select):
+            if "(" in item:
+                name, _, inner = item.partition("(")
+                alias, _, child = name.rpartition(":")
+                result[alias or child] = self._embed(table, row, child.removesuffix("!inner"), inner.rstrip(")"))
+            elif item == "*":
+                result.update(row)
+            else:
+                alias, _, column = item.rpartition(":")
+                column = column.split("::")[0]
+                result[alias or column] = row.get(column)
+        return result
+
+    def _embed(self, table: str, row: dict, embedded: str, select: str):
+        if (table, embedded) not in RELATIONSHIPS:
+            raise FakeError(501, f"No relationship between {table} and {embedded} in the fake")
+        column, to_many = RELATIONSHIPS[(table, embedded)]
+        if not to_many:
+            match = next((other for other in self.tables[embedded] if other["id"] == row.get(column)), None)
+            return self._project(embedded, match, select) if match else None
+        children = [other for other in self.tables[embedded] if other.get(column) == row["id"]]
+        if select.strip() == "count":
+            return [{"count": len(children)}]
+        return [self._project(embedded, other, select) for other in children]
+
+    def _upsert(self, table: str, values: dict, on_conflict: str) -> dict:
+        columns = on_conflict.split(",")
+        for row in self.tables[table]:
+            if all(row.get(column) == values.get(column) for column in columns):
+                row.update(values)
+                self._log_change(table, "update", row)
+                return dict(row)
+        return self._insert_row(table, values)
+
+    # RPC
+
+    def _rpc(self, name: str, params: dict):
+        handler = getattr(self, f"_rpc_{name}", None)
+        if handler is None:
+            raise FakeError(501, f"RPC {name} is not implemented by the fake")
+        return handler(**params)
+
+    def _class_ids(self, church_id: str, teacher_id: str | None) -> set[str]:
+        if teacher_id is None:
+            return {row["id"] for row in self.tables["classes"] if row["church_id"] == church_id}
+        return {row["class_id"] for row in self.tables["class_teachers"] if row["teacher_id"] == teacher_id}
+
+    def _rpc_get_attendance_analytics(self, p_church_id: str, p_teacher_id: str | None = None) -> list[dict]:
+        class_ids = self._class_ids(p_church_id, p_teacher_id)
+        present, total = defaultdict(int), defaultdict(int)
+        for session in self.tables["attendance_sessions"]:
+            if session["church_id"] == p_church_id and session["class_id"] in class_ids:
+                session_present, session_total = self._session_totals[session["id"]]
+                present[session["session_date"]] += session_present
+                total[session["session_date"]] += session_total
+        return [
+            {
+                "session_date": day,
+                "present_count": present[day],
+                "total_count": total[day],
+                "attendance_rate": round(present[day] * 100 / total[day], 2) if total[day] else None,
+            }
+            for day in sorted(total)[-ANALYTICS_POINTS:]
+        ]
+
+    def _rpc_get_performance_analytics(self, p_church_id: str, p_teacher_id: str | None = None) -> list[dict]:
+        class_ids = self._class_ids(p_church_id, p_teacher_id)
+        percent_sum, count = defaultdict(float), defaultdict(int)
+        for test in self.tables["performance_tests"]:
+            if test["church_id"] == p_church_id and test["class_id"] in class_ids:
+                test_sum, test_count = self._test_totals[test["id"]]
+                percent_sum[test["taken_on"]] += test_sum
+                count[test["taken_on"]] += test_count
+        return [
+            {"taken_on": day, "avg_percent": round(percent_sum[day] / count[day], 2) if count[day] else None}
+            for day in sorted(count)[-ANALYTICS_POINTS:]
+        ]
+
+    def _rpc_get_class_overview(self, p_church_id: str, p_since: str | None = None) -> list[dict]:
+        since = p_since or str(date.today() - timedelta(days=28))
+        classes = sorted((row for row in self.tables["classes"] if row["church_id"] == p_church_id), key=lambda row: row["name"])
+        class_ids = {row["id"] for row in classes}
+        roster = defaultdict(int)
+        for student in self.tables["students"]:
+            if student["class_id"] in class_ids:
+                roster[student["class_id"]] += 1
+        names = {row["id"]: row["full_name"] for row in self.tables["users"] if row["church_id"] == p_church_id}
+        teachers = defaultdict(list)
+        for row in self.tables["class_teachers"]:
+            if row["class_id"] in class_ids:
+                teachers[row["class_id"]].append({"id": row["teacher_id"], "full_name": names[row["teacher_id"]]})
+        last_session, present, total = {}, defaultdict(int), defaultdict(int)
+        for session in self.tables["attendance_sessions"]:
+            class_id = session["class_id"]
+            if class_id not in class_ids:
+                continue
+            last_session[class_id] = max(last_session.get(class_id, session["session_date"]), session["session_date"])
+            if session["session_date"] >= since:
+                session_present, session_total = self._session_totals[session["id"]]
+                present[class_id] += session_present
+                total[class_id] += session_total
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "description": row.get("description"),
+                "age_group": row["age_group"],
+                "student_count": roster[row["id"]],
+                "teachers": sorted(teachers[row["id"]], key=lambda teacher: teacher["full_name"]),
+                "last_session_date": last_session.get(row["id"]),
+                "present_count": present[row["id"]],
+                "total_count": total[row["id"]],
+                "attendance_rate": round(present[row["id"]] * 100 / total[row["id"]], 2) if total[row["id"]] else None,
+            }
+            for row in classes
+        ]
+
+    def _rpc_get_class_report_data(self, p_church_id: str, p_class_id: str, p_from: str, p_to: str) -> dict | None:
+        klass = next((row for row in self.tables["classes"] if row["id"] == p_class_id and row["church_id"] == p_church_id), None)
+        if klass is None:
+            return None
+        names = {row["id"]: row["full_name"] for row in self.tables["users"]}
+        attendance = defaultdict(lambda: {"present": 0, "total": 0})
+        for record in self.tables["attendance_records"]:
+            if p_from <= record["session_date"] <= p_to:
+                attendance[record["student_id"]]["present"] += bool(record["present"])
+                attendance[record["student_id"]]["total"] += 1
+        tests = {row["id"]: row for row in self.tables["performance_tests"] if row["class_id"] == p_class_id}
+        scores = defaultdict(list)
+        for score in self.tables["performance_scores"]:
+            test = tests.get(score["test_id"])
+            if test and p_from <= score["taken_on"] <= p_to:
+                scores[score["student_id"]].append({
+                    "title": test["title"], "taken_on": test["taken_on"], "score": score["score"], "max_score": score["max_score"],
+                })
+        notes = defaultdict(list)
+        for note in self.tables["student_notes"]:
+            if p_from <= note["created_at"][:10] <= p_to:
+                notes[note["student_id"]].append({"note": note["note"], "created_at": note["created_at"], "author": names.get(note["author_id"])})
+        students = sorted(
+            (row for row in self.tables["students"] if row["class_id"] == p_class_id),
+            key=lambda row: (row["last_name"], row["first_name"]),
+        )
+        return {
+            "class": {"id": klass["id"], "name": klass["name"], "age_group": klass["age_group"]},
+            "teachers": sorted(names[row["teacher_id"]] for row in self.tables["class_teachers"] if row["class_id"] == p_class_id),
+            "students": [
+                {
+                    "id": student["id"],
+                    "first_name": student["first_name"],
+                    "last_name": student["last_name"],
+                    "date_of_birth": student["date_of_birth"],
+                    "attendance": attendance[student["id"]],
+                    "scores": sorted(scores[student["id"]], key=lambda score: score["taken_on"]),
+                    "notes": sorted(notes[student["id"]], key=lambda note: note["created_at"]),
+                }
+                for student in students
+            ],
+        }
+
+    def _rpc_get_upcoming_birthdays(self, p_church_id: str, p_days: int = 30) -> list[dict]:
+        today = date.today()
+        class_names = {row["id"]: row["name"] for row in self.tables["classes"] if row["church_id"] == p_church_id}
+        result = []
+        for student in self.tables["students"]:
+            if student["church_id"] != p_church_id:
+                continue
+            born = date.fromisoformat(student["date_of_birth"])
+            try:
+                upcoming = born.replace(year=today.year)
+            except ValueError:
+                upcoming = date(today.year, 3, 1)
+            if upcoming < today:
+                upcoming = upcoming.replace(year=today.year + 1)
+            days = (upcoming - today).days
+            if days <= p_days:
+                result.append({
+                    "student_id": student["id"],
+                    "full_name": f"{student['first_name']} {student['last_name']}",
+                    "class_name": class_names.get(student["class_id"]),
+                    "date_of_birth": student["date_of_birth"],
+                    "days_until_birthday": days,
+                })
+        return sorted(result, key=lambda row: row["days_until_birthday"])
+
+    def _rpc_search_students(self, p_church_id: str, p_query: str, p_class_ids: list[str] | None = None, p_limit: int = 20) -> list[dict]:
+        """Literal substring matches only, ranked 1: trigram (``<%``) matches are not modelled."""
+        term = p_query.strip().lower()
+        columns = ("first_name", "last_name", "guardian_name", "guardian_contact")
+        result = []
+        for student in self.tables["students"]:
+            if student["church_id"] != p_church_id or (p_class_ids is not None and student["class_id"] not in p_class_ids):
+                continue
+            if term in " ".join(student[column] or "" for column in columns).lower():
+                result.append({
+                    **{column: student[column] for column in ("id", "class_id", *columns, "avatar_url")},
+                    "rank": 1.0,
+                })
+        return sorted(result, key=lambda row: (-row["rank"], row["first_name"], row["last_name"]))[:p_limit]
+
+    def _rpc_get_changes(self, p_church_id: str, p_since: int, p_limit: int = 500) -> dict:
+        # Requests run one at a time, so every transaction before this one has finished.
+        horizon = self._xact
+        eligible = [
+            change for change in self.tables["change_log"]
+            if change["church_id"] == p_church_id and p_since < change["xact_id"] < horizon
+        ]
+        boundary = eligible[max(p_limit - 1, 0)]["xact_id"] if len(eligible) >= p_limit else None
+        kept = [change for change in eligible if boundary is None or change["xact_id"] <= boundary]
+        latest = {(change["table_name"], change["row_id"]): change for change in kept}
+        return {
+            "compacted_through": 0,
+            "latest": horizon - 1,
+            "has_more": boundary is not None and eligible[-1]["xact_id"] > boundary,
+            "cursor": kept[-1]["xact_id"] if kept else p_since,
+            "changes": [
+                {"table": change["table_name"], "id": change["row_id"], "op": change["op"], "row": change["data"]}
+                for change in sorted(latest.values(), key=lambda change: change["id"])
+            ],
+        }
+
+    def _rpc_get_regional_analytics(self, p_region: str, p_from: str, p_to: str) -> list[dict]:
+        branches = sorted(
+            (row for row in self.tables["churches"] if row["region"] == p_region),
+            key=lambda row: (row["name"], row["branch_name"]),
+        )
+        branch_ids = {row["id"] for row in branches}
+        sessions, present, total = defaultdict(int), defaultdict(int), defaultdict(int)
+        for session in self.tables["attendance_sessions"]:
+            if session["church_id"] in branch_ids and p_from <= session["session_date"] <= p_to:
+                session_present, session_total = self._session_totals[session["id"]]
+                sessions[session["church_id"]] += 1
+                present[session["church_id"]] += session_present
+                total[session["church_id"]] += session_total
+        tests, percent_sum, percent_count = defaultdict(int), defaultdict(float), defaultdict(int)
+        for test in self.tables["performance_tests"]:
+            if test["church_id"] in branch_ids and p_from <= test["taken_on"] <= p_to:
+                test_sum, test_count = self._test_totals[test["id"]]
+                tests[test["church_id"]] += 1
+                percent_sum[test["church_id"]] += test_sum
+                percent_count[test["church_id"]] += test_count
+
+        def rollup(church: dict | None, ids: list[str]) -> dict:
+            row_present, row_total = sum(present[i] for i in ids), sum(total[i] for i in ids)
+            row_sum, row_count = sum(percent_sum[i] for i in ids), sum(percent_count[i] for i in ids)
+            return {
+                **{column: church and church[column] for column in ("name", "branch_name", "district", "area")},
+                "church_id": church and church["id"],
+                "sessions": sum(sessions[i] for i in ids),
+                "present_count": row_present,
+                "total_count": row_total,
+                "attendance_rate": round(row_present * 100 / row_total, 2) if row_total else None,
+                "tests": sum(tests[i] for i in ids),
+                "avg_percent": round(row_sum / row_count, 2) if row_count else None,
+            }
+
+        return [rollup(church, [church["id"]]) for church in branches] + [rollup(None, list(branch_ids))]
+
+    def _rpc_assign_teacher(self, p_church_id: str, p_class_id: str, p_teacher_id: str) -> list[dict]:
+        if not any(row["id"] == p_class_id and row["church_id"] == p_church_id for row in self.tables["classes"]):
+            return []
+        existing = next(
+            (row for row in self.tables["class_teachers"] if row["class_id"] == p_class_id and row["teacher_id"] == p_teacher_id),
+            None,
+        )
+        if existing:
+            return [dict(existing)]
+        if not any(u["id"] == p_teacher_id and u["church_id"] == p_church_id and u["role"] == "teacher" for u in self.tables["users"]):
+            return []
+        return [dict(self._insert_row("class_teachers", {"church_id": p_church_id, "class_id": p_class_id, "teacher_id": p_teacher_id}))]
+
+    def _rpc_remove_teacher(self, p_church_id: str, p_teacher_id: str) -> str | None:
+        teacher = next(
+            (u for u in self.tables["users"] if u["id"] == p_teacher_id and u["church_id"] == p_church_id and u["role"] == "teacher"),
+            None,
+        )
+        if teacher is None:
+            return None
+        for table, column in USER_RESTRICT:
+            if any(row[column] == p_teacher_id for row in self.tables[table]):
+                raise FakeError(409, f'update or delete on table "users" violates foreign key constraint on table "{table}"', code="23503")
+        # The cascades and set-nulls schema.sql declares on users.
+        self._delete_rows("class_teachers", [row for row in self.tables["class_teachers"] if row["teacher_id"] == p_teacher_id])
+        self._delete_rows("user_settings", [row for row in self.tables["user_settings"] if row["user_id"] == p_teacher_id])
+        self._delete_rows("regional_coordinators", [row for row in self.tables["regional_coordinators"] if row["user_id"] == p_teacher_id])
+        for row in self.tables["notifications"]:
+            if row.get("created_by") == p_teacher_id:
+                row["created_by"] = None
+        self._delete_rows("users", [teacher])
+        self._upsert("revoked_users", {"user_id": p_teacher_id, "revoked_at": _now()}, "user_id")
+        cutoff = (datetime.now(timezone.utc) - REVOCATION_RETENTION).isoformat()
+        self.tables["revoked_users"] = [row for row in self.tables["revoked_users"] if row["revoked_at"] >= cutoff]
+        return p_teacher_id
+
+    # Auth
+
+    def issue_token(self, user: dict) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": user["id"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": user["email"],
+            "iat": now,
+            "exp": now + 3600,
+            # What custom_access_token_hook adds in schema.sql.
+            "user_role": user["role"],
+            "church_id": user["church_id"],
+        }
+        if region := self.coordinator_region(user["id"]):
+            claims["coordinator_region"] = region
+        return jwt.encode(claims, self._signing_key, algorithm="RS256", headers={"kid": KEY_ID})
+
+    def _auth_user(self, user: dict) -> dict:
+        return {
+            "id": user["id"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": user["email"],
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {},
+            "created_at": user["created_at"],
+        }
+
+    def _auth(self, request: httpx.Request, path: str) -> httpx.Response:
+        if path == ".well-known/jwks.json":
+            return self._json(200, {"keys": self._jwks})
+        if path == "token" and request.url.params.get("grant_type") == "password":
+            body = json.loads(request.content)
+            user = next((u for u in self.tables["users"] if u["email"] == body.get("email")), None)
+            if user is None or body.get("password") != PASSWORD:
+                return self._json(400, {"error": "invalid_grant", "error_description": "Invalid login credentials"})
+            return self._json(200, {
+                "access_token": self.issue_token(user),
+                "refresh_token": uuid.uuid4().hex,
+                "expires_in": 3600,
+                "expires_at": int(time.time()) + 3600,
+                "token_type": "bearer",
+                "user": self._auth_user(user),
+            })
+        if path == "admin/users" and request.method == "POST":
+            body = json.loads(request.content)
+            # Mirrors the on_auth_user_profile trigger: role and church in app_metadata, the rest in user_metadata.
+            app_metadata, user_metadata = body.get("app_metadata") or {}, body.get("user_metadata") or {}
+            user = self._insert_row("users", {
+                "id": str(uuid.uuid4()),
+                "email": body["email"],
+                "full_name": user_metadata.get("full_name"),
+                "avatar_url": None,
+                "role": app_metadata.get("role"),
+                "church_id": app_metadata.get("church_id"),
+                **(user_metadata.get("profile") or {}),
+            })
+            return self._json(200, self._auth_user(user))
+        raise FakeError(501, f"Auth endpoint {request.method} {path} is not implemented by the fake")
+
+    # Storage
+
+    def _storage(self, request: httpx.Request, path: str) -> httpx.Response:
+        if path.startswith("object/sign/"):
+            key = path.removeprefix("object/sign/")
+            return self._json(200, {"signedURL": f"/object/sign/{key}?token={uuid.uuid4().hex}"})
+        if path.startswith("object/") and request.method in ("POST", "PUT"):
+            key = path.removeprefix("object/")
+            self.objects[key] = request.content
+            return self._json(200, {"Key": key})
+        raise FakeError(501, f"Storage endpoint {request.method} {path} is not implemented by the fake")
+
+
+@contextmanager
+def serve(fake: FakeSupabase):
+    """Answer every httpx request to ``fake.host`` from ``fake``, after the injected latency.
+
+    Sync calls sleep in the calling thread, so a handler that calls Supabase directly blocks the
+    event loop for the latency, as it would against the real service.
+    """
+    sync_send = httpx.HTTPTransport.handle_request
+    async_send = httpx.AsyncHTTPTransport.handle_async_request
+
+    # Streamed bodies (multipart uploads) must be read before the fake can use ``request.content``.
+    def handle_request(transport, request):
+        if request.url.host != fake.host:
+            return sync_send(transport, request)
+        request.read()
+        time.sleep(fake.delay())
+        return fake.handle(request)
+
+    async def handle_async_request(transport, request):
+        if request.url.host != fake.host:
+            return await async_send(transport, request)
+        await request.aread()
+        await asyncio.sleep(fake.delay())
+        return fake.handle(request)
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+    try:
+        yield fake
+    finally:
+        httpx.HTTPTransport.handle_request = sync_send
+        httpx.AsyncHTTPTransport.handle_async_request = async_send
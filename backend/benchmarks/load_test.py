@@ -0,0 +1,363 @@
+"""Load test: concurrent user scenarios against ``app.main.app`` backed by the in-memory Supabase fake.
+
+Scenarios:
+
+- ``sunday_attendance_burst``: every teacher logs in, loads their classes and students, and
+  records attendance for each class at once.
+- ``admin_dashboard_refresh``: several admin tabs per church reload bootstrap, then the dashboard
+  counts and both report charts in parallel.
+- ``notification_polling``: every user polls ``/common/notifications``.
+- ``report_card_jobs``: every admin starts a report-card job for the whole church, polls it until
+  it finishes and fetches the download link. A job that fails or skips students counts as an error.
+- ``teacher_roster_changes``: every admin creates a teacher, assigns them to classes (once twice),
+  unassigns one, reads the change feed, searches students and the regional rollup, then removes the
+  teacher. The teacher must see only the class still assigned, and be refused once removed. Only
+  regional coordinators may read the rollup; the other admins must get ``403``.
+
+Each upstream call sleeps for ``--latency-ms`` (plus up to ``--jitter-ms``) in the fake, so handlers
+that call Supabase on the event loop show up as they would in production. Requests go through
+httpx's ASGI transport, which skips the server's socket and HTTP parsing layers. Results (p50/p95/p99,
+requests per second, upstream calls per request) are printed and written as JSON. ``--baseline``
+compares against an earlier run and exits non-zero when p95 or throughput regress beyond
+``--tolerance``.
+
+    cd backend
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --baseline benchmarks/results/<earlier run>.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+from .fake_supabase import PASSWORD, FakeSupabase, serve
+
+CHURCHES = 5
+CLASSES_PER_CHURCH = 12
+STUDENTS_PER_CLASS = 40
+WEEKS_OF_HISTORY = 26
+TESTS_PER_CLASS = 12
+
+ADMIN_TABS_PER_CHURCH = 4
+DASHBOARD_ROUNDS = 10
+POLLING_ROUNDS = 20
+REPORT_WEEKS = 8
+JOB_POLL_INTERVAL_S = 0.25
+ROSTER_CLASSES = 3
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Each virtual user calls from its own address, so per-IP rate limits apply per user as in production.
+client_address: ContextVar[str] = ContextVar("client_address", default="10.0.0.1")
+
+
+def _load_app(fake: FakeSupabase):
+    """Import the app pointed at the fake. Settings are read at import time, so this runs first."""
+    os.environ.update(
+        SUPABASE_URL=fake.url,
+        SUPABASE_ANON_KEY="load-test.anon",
+        SUPABASE_SERVICE_ROLE_KEY="load-test.service-role",
+        # Keep the run self-contained: the in-process cache, never a shared Redis.
+        CACHE_URL="",
+        RATE_LIMIT_TRUSTED_PROXIES="1",
+    )
+    from app.config import settings
+    from app.logging import log_writer
+    from app.main import app
+
+    # Request logs are still formatted and written, so their cost counts, but not printed.
+    log_writer.stream = open(os.devnull, "wb")
+    return app, settings.api_prefix
+
+
+class Recorder:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.first_error: dict[str, str] = {}
+
+    async def call(
+        self, label: str, method: str, path: str, token: str | None = None, expect: int | None = None, **kwargs
+    ) -> httpx.Response:
+        """Time one request. Any status of 400 or above is an error, unless it is ``expect``."""
+        headers = {"x-forwarded-for": client_address.get()}
+        if token:
+            headers["authorization"] = f"Bearer {token}"
+        started = time.perf_counter()
+        response = await self.client.request(method, path, headers=headers, **kwargs)
+        self.samples[label].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400 if expect is None else response.status_code != expect:
+            self.fail(label, f"{response.status_code} {response.text[:300]}")
+        return response
+
+    def fail(self, label: str, detail: str) -> None:
+        self.errors[label] += 1
+        self.first_error.setdefault(label, detail)
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def _summary(samples: list[float], errors: int, wall_s: float) -> dict:
+    ordered = sorted(samples)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / wall_s, 1),
+        "mean_ms": round(sum(ordered) / len(ordered), 2),
+        "p50_ms": round(_percentile(ordered, 50), 2),
+        "p95_ms": round(_percentile(ordered, 95), 2),
+        "p99_ms": round(_percentile(ordered, 99), 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+async def _from_address(index: int, user) -> None:
+    client_address.set(f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}")
+    await user
+
+
+# Scenarios: each returns one coroutine per virtual user.
+
+
+def sunday_attendance_burst(rec: Recorder, fake: FakeSupabase, prefix: str) -> list:
+    today = date.today()
+    sunday = str(today - timedelta(days=(today.weekday() + 1) % 7))
+
+    async def teacher(user: dict) -> None:
+        login = await rec.call("POST /auth/login", "POST", f"{prefix}/auth/login", json={"email": user["email"], "password": PASSWORD})
+        token = login.json()["access_token"]
+        classes = (await rec.call("GET /teacher/classes", "GET", f"{prefix}/teacher/classes", token)).json()
+        students = (await rec.call("GET /teacher/students", "GET", f"{prefix}/teacher/students", token)).json()
+        for klass in classes:
+            roster = [s for s in students if s["class_id"] == klass["id"]]
+            body = {
+                "class_id": klass["id"],
+                "session_date": sunday,
+                "students": [{"student_id": s["id"], "present": i % 7 != 0} for i, s in enumerate(roster)],
+            }
+            await rec.call("POST /teacher/attendance", "POST", f"{prefix}/teacher/attendance", token, json=body)
+
+    return [teacher(user) for user in fake.users("teacher")]
+
+
+def admin_dashboard_refresh(rec: Recorder, fake: FakeSupabase, prefix: str) -> list:
+    async def admin_tab(token: str) -> None:
+        for _ in range(DASHBOARD_ROUNDS):
+            await rec.call("GET /common/bootstrap", "GET", f"{prefix}/common/bootstrap", token)
+            await asyncio.gather(
+                rec.call("GET /admin/dashboard", "GET", f"{prefix}/admin/dashboard", token),
+                rec.call("GET /admin/attendance-reports", "GET", f"{prefix}/admin/attendance-reports", token),
+                rec.call("GET /admin/performance-reports", "GET", f"{prefix}/admin/performance-reports", token),
+            )
+
+    admins = fake.users("admin")
+    return [admin_tab(fake.issue_token(user)) for user in admins for _ in range(ADMIN_TABS_PER_CHURCH)]
+
+
+def notification_polling(rec: Recorder, fake: FakeSupabase, prefix: str) -> list:
+    async def poller(token: str) -> None:
+        for _ in range(POLLING_ROUNDS):
+            await rec.call("GET /common/notifications", "GET", f"{prefix}/common/notifications", token)
+
+    return [poller(fake.issue_token(user)) for user in fake.users()]
+
+
+def report_card_jobs(rec: Recorder, fake: FakeSupabase, prefix: str) -> list:
+    today = date.today()
+    body = {"date_from": str(today - timedelta(weeks=REPORT_WEEKS)), "date_to": str(today), "format": "html"}
+
+    async def admin(token: str) -> None:
+        job = (await rec.call("POST /admin/reports/report-cards", "POST", f"{prefix}/admin/reports/report-cards", token, json=body)).json()
+        while job["status"] in ("queued", "running"):
+            await asyncio.sleep(JOB_POLL_INTERVAL_S)
+            job = (await rec.call("GET /admin/jobs/{job_id}", "GET", f"{prefix}/admin/jobs/{job['id']}", token)).json()
+        if job["status"] != "completed" or job["done"] != job["total"]:
+            rec.fail("report-card job", f"{job['status']} {job['done']}/{job['total']} {job.get('error')}")
+            return
+        await rec.call("GET /admin/jobs/{job_id}/download", "GET", f"{prefix}/admin/jobs/{job['id']}/download", token)
+
+    return [admin(fake.issue_token(user)) for user in fake.users("admin")]
+
+
+def teacher_roster_changes(rec: Recorder, fake: FakeSupabase, prefix: str) -> list:
+    async def admin(index: int, user: dict) -> None:
+        token = fake.issue_token(user)
+        feed = (await rec.call("GET /common/changes", "GET", f"{prefix}/common/changes", token)).json()
+        classes = (await rec.call("GET /admin/classes", "GET", f"{prefix}/admin/classes", token)).json()[:ROSTER_CLASSES]
+        body = {"full_name": f"New Teacher {index}", "email": f"new-teacher{index}@load.test", "password": PASSWORD}
+        teacher = (await rec.call("POST /admin/teachers", "POST", f"{prefix}/admin/teachers", token, json=body)).json()
+        for klass in [classes[0], *classes]:
+            assignment = {"teacher_id": teacher["id"], "class_id": klass["id"]}
+            await rec.call("POST /admin/classes/assign-teacher", "POST", f"{prefix}/admin/classes/assign-teacher", token, json=assignment)
+        for klass in classes[1:]:
+            path = f"{prefix}/admin/classes/{klass['id']}/teachers/{teacher['id']}"
+            await rec.call("DELETE /admin/classes/{class_id}/teachers/{teacher_id}", "DELETE", path, token)
+
+        feed = (await rec.call("GET /common/changes", "GET", f"{prefix}/common/changes", token, params={"since": feed["cursor"]})).json()
+        ops = sorted(change["op"] for change in feed["changes"] if change["table"] == "class_teachers")
+        if ops != ["delete"] * (len(classes) - 1) + ["insert"]:
+            rec.fail("change feed", f"class_teachers changes {ops}")
+        await rec.call("GET /admin/students/search", "GET", f"{prefix}/admin/students/search", token, params={"q": "child1"})
+        coordinator = fake.coordinator_region(user["id"]) is not None
+        await rec.call("GET /regional/analytics", "GET", f"{prefix}/regional/analytics", token, expect=None if coordinator else 403)
+
+        login = await rec.call("POST /auth/login", "POST", f"{prefix}/auth/login", json={"email": body["email"], "password": PASSWORD})
+        teacher_token = login.json()["access_token"]
+        assigned = (await rec.call("GET /teacher/classes", "GET", f"{prefix}/teacher/classes", teacher_token)).json()
+        if [klass["id"] for klass in assigned] != [classes[0]["id"]]:
+            rec.fail("teacher classes", f"expected {classes[0]['id']}, got {[klass['id'] for klass in assigned]}")
+        await rec.call("DELETE /admin/teachers/{teacher_id}", "DELETE", f"{prefix}/admin/teachers/{teacher['id']}", token)
+        await rec.call("GET /teacher/classes (removed)", "GET", f"{prefix}/teacher/classes", teacher_token, expect=401)
+
+    return [admin(index, user) for index, user in enumerate(fake.users("admin"))]
+
+
+SCENARIOS = {
+    "sunday_attendance_burst": sunday_attendance_burst,
+    "admin_dashboard_refresh": admin_dashboard_refresh,
+    "notification_polling": notification_polling,
+    "report_card_jobs": report_card_jobs,
+    "teacher_roster_changes": teacher_roster_changes,
+}
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    fake = FakeSupabase(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    fake.seed(CHURCHES, CLASSES_PER_CHURCH, STUDENTS_PER_CLASS, WEEKS_OF_HISTORY, TESTS_PER_CLASS)
+    app, prefix = _load_app(fake)
+
+    results = {}
+    with serve(fake):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60) as client:
+            for name in args.scenarios:
+                rec = Recorder(client)
+                users = SCENARIOS[name](rec, fake, prefix)
+                calls_before = sum(fake.calls.values())
+                started = time.perf_counter()
+                await asyncio.gather(*(_from_address(index, user) for index, user in enumerate(users)))
+                wall_s = time.perf_counter() - started
+
+                all_samples = [sample for samples in rec.samples.values() for sample in samples]
+                overall = _summary(all_samples, sum(rec.errors.values()), wall_s)
+                upstream = sum(fake.calls.values()) - calls_before
+                results[name] = {
+                    "virtual_users": len(users),
+                    "duration_s": round(wall_s, 3),
+                    "overall": overall,
+                    "upstream_calls": upstream,
+                    "upstream_calls_per_request": round(upstream / overall["requests"], 2),
+                    "endpoints": {label: _summary(samples, rec.errors[label], wall_s) for label, samples in sorted(rec.samples.items())},
+                    "first_errors": rec.first_error,
+                }
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print(results: dict) -> None:
+    for name, scenario in results.items():
+        overall = scenario["overall"]
+        print(
+            f"\n{name}: {scenario['virtual_users']} users, {overall['requests']} requests in {scenario['duration_s']:.2f}s, "
+            f"{scenario['upstream_calls_per_request']} upstream calls/request"
+        )
+        print(f"  {'endpoint':<34} {'reqs':>6} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for label, stats in [*scenario["endpoints"].items(), ("(all)", overall)]:
+            print(
+                f"  {label:<34} {stats['requests']:>6} {stats['errors']:>5} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms"
+            )
+        for label, error in scenario["first_errors"].items():
+            print(f"  first error on {label}: {error}")
+
+
+def _compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against ``baseline``: p95 up, or throughput down, by more than ``tolerance``."""
+    regressions = []
+    for name, scenario in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        pairs = [("(all)", scenario["overall"], before["overall"])]
+        pairs += [(label, stats, before["endpoints"][label]) for label, stats in scenario["endpoints"].items() if label in before["endpoints"]]
+        for label, now, then in pairs:
+            if now["p95_ms"] > then["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name} {label}: p95 {then['p95_ms']}ms -> {now['p95_ms']}ms")
+        if scenario["overall"]["rps"] < before["overall"]["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['overall']['rps']} -> {scenario['overall']['rps']} rps")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=15.0, help="injected latency per upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="uniform +/- jitter on the injected latency")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/load_test-<UTC time>.json)")
+    parser.add_argument("--baseline", type=Path, help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    results = asyncio.run(_run(args))
+    _print(results)
+
+    report = {
+        "meta": {
+            "created_at": started_at.isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "volumes": {
+                "churches": CHURCHES,
+                "classes_per_church": CLASSES_PER_CHURCH,
+                "students_per_class": STUDENTS_PER_CLASS,
+                "weeks_of_history": WEEKS_OF_HISTORY,
+                "tests_per_class": TESTS_PER_CLASS,
+            },
+        },
+        "scenarios": results,
+    }
+    output = args.output or RESULTS_DIR / f"load_test-{started_at:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        settings_keys = ("latency_ms", "jitter_ms", "volumes")
+        if any(baseline["meta"].get(key) != report["meta"][key] for key in settings_keys):
+            print("warning: the baseline used different latency or volumes; the comparison is not like for like", file=sys.stderr)
+        regressions = _compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
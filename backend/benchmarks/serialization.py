@@ -0,0 +1,87 @@
+"""Serialization benchmark for a 5,000-student /admin/students payload.
+
+Compares the old path (raw ``select("*")`` rows through ``jsonable_encoder`` and
+``JSONResponse``) with the typed ``StudentOut`` response model rendered by
+``ORJSONResponse``, plus a ``?fields=`` sparse fieldset.
+
+    cd backend
+    python -m benchmarks.serialization
+"""
+
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from app.schemas.admin import StudentOut
+
+STUDENTS = 5000
+ROUNDS = 20
+
+
+def _rows(count: int) -> list[dict]:
+    church_id = str(uuid.uuid4())
+    class_ids = [str(uuid.uuid4()) for _ in range(8)]
+    rows = []
+    for i in range(count):
+        rows.append(
+            {
+                "id": str(uuid.uuid4()),
+                "church_id": church_id,
+                "class_id": class_ids[i % len(class_ids)],
+                "first_name": f"Child{i}",
+                "last_name": f"Family{i // 3}",
+                "date_of_birth": str(date(2014, 1, 1) + timedelta(days=i % 2500)),
+                "guardian_name": f"Guardian {i // 3}",
+                "guardian_contact": f"+23324{i:07d}",
+                "allergies": "Peanuts" if i % 11 == 0 else None,
+                "notes": "Sits near the front" if i % 7 == 0 else None,
+                "gender": "female" if i % 2 else "male",
+                "avatar_url": f"https://example.supabase.co/storage/v1/object/public/student-avatars/{i}.jpg",
+                # Columns that select("*") used to leak to the client.
+                "created_at": "2024-09-01T10:15:30.123456+00:00",
+            }
+        )
+    return rows
+
+
+def _time(fn) -> tuple[float, bytes]:
+    samples = []
+    body = b""
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        body = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), body
+
+
+def main() -> None:
+    rows = _rows(STUDENTS)
+    adapter = TypeAdapter(list[StudentOut])
+    sparse_keys = ("id", "first_name", "last_name", "class_id")
+    sparse_rows = [{key: row[key] for key in sparse_keys} for row in rows]
+
+    cases = {
+        "select(*) + jsonable_encoder + JSONResponse": lambda: JSONResponse(jsonable_encoder(rows)).body,
+        "StudentOut + ORJSONResponse": lambda: ORJSONResponse(adapter.dump_python(adapter.validate_python(rows), mode="json")).body,
+        "?fields=id,first_name,last_name,class_id": lambda: ORJSONResponse(sparse_rows).body,
+    }
+
+    print(f"{STUDENTS} students, median of {ROUNDS} rounds")
+    baseline_ms, baseline_body = None, None
+    for name, fn in cases.items():
+        elapsed_ms, body = _time(fn)
+        if baseline_ms is None:
+            baseline_ms, baseline_body = elapsed_ms, body
+        print(
+            f"{name:<45} {elapsed_ms:8.2f} ms  {len(body) / 1024:8.1f} KiB"
+            f"  ({baseline_ms / elapsed_ms:4.1f}x faster, {100 - len(body) * 100 / len(baseline_body):5.1f}% smaller)"
+        )
+
+
+if __name__ == "__main__":
+    main()
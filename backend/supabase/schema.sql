@@ -1,5 +1,6 @@
 -- Extensions
 create extension if not exists "uuid-ossp";
+create extension if not exists pg_trgm;
 
 -- Enums
 create type app_role as enum ('admin', 'teacher');
@@ -40,6 +41,7 @@ create table if not exists classes (
 
 create table if not exists class_teachers (
   id uuid primary key default uuid_generate_v4(),
+  church_id uuid not null references churches(id) on delete cascade,
   class_id uuid not null references classes(id) on delete cascade,
   teacher_id uuid not null references users(id) on delete cascade,
   unique(class_id, teacher_id)
@@ -61,43 +63,99 @@ create table if not exists students (
   created_at timestamptz not null default now()
 );
 
+-- Installs from before history partitioning: set the plain tables (and their index names) aside so the
+-- partitioned tables below can be created; their rows are copied across once the partitions exist.
+do $$
+declare
+  t text;
+  idx record;
+begin
+  foreach t in array array['attendance_records', 'performance_scores', 'attendance_sessions', 'performance_tests'] loop
+    if exists (select 1 from pg_class where oid = to_regclass('public.' || t) and relkind = 'r') then
+      execute format('alter table %I rename to %I', t, t || '_legacy');
+      execute format('drop trigger if exists %I on %I', t || '_change_log', t || '_legacy');
+      for idx in select c.relname from pg_index i join pg_class c on c.oid = i.indexrelid where i.indrelid = to_regclass('public.' || t || '_legacy') loop
+        execute format('alter index %I rename to %I', idx.relname, left(idx.relname, 56) || '_legacy');
+      end loop;
+    end if;
+  end loop;
+end $$;
+
+-- Attendance and performance history is range-partitioned by year (see ensure_history_partitions).
+-- Records and scores carry their session/test date so they land in the same year as their parent.
 create table if not exists attendance_sessions (
-  id uuid primary key default uuid_generate_v4(),
+  id uuid not null default uuid_generate_v4(),
   church_id uuid not null references churches(id) on delete cascade,
   class_id uuid not null references classes(id) on delete cascade,
   session_date date not null,
   recorded_by uuid not null references users(id) on delete restrict,
   created_at timestamptz not null default now(),
+  primary key (id, session_date),
   unique(class_id, session_date)
-);
+) partition by range (session_date);
 
 create table if not exists attendance_records (
-  id uuid primary key default uuid_generate_v4(),
-  attendance_session_id uuid not null references attendance_sessions(id) on delete cascade,
+  id uuid not null default uuid_generate_v4(),
+  attendance_session_id uuid not null,
+  session_date date not null,
   student_id uuid not null references students(id) on delete cascade,
   present boolean not null,
   notes text,
-  unique(attendance_session_id, student_id)
-);
+  primary key (id, session_date),
+  unique(attendance_session_id, student_id, session_date),
+  foreign key (attendance_session_id, session_date) references attendance_sessions(id, session_date) on delete cascade
+) partition by range (session_date);
 
 create table if not exists performance_tests (
-  id uuid primary key default uuid_generate_v4(),
+  id uuid not null default uuid_generate_v4(),
   church_id uuid not null references churches(id) on delete cascade,
   class_id uuid not null references classes(id) on delete cascade,
   title text not null,
   taken_on date not null,
   recorded_by uuid not null references users(id) on delete restrict,
-  created_at timestamptz not null default now()
-);
+  created_at timestamptz not null default now(),
+  primary key (id, taken_on)
+) partition by range (taken_on);
 
 create table if not exists performance_scores (
-  id uuid primary key default uuid_generate_v4(),
-  test_id uuid not null references performance_tests(id) on delete cascade,
+  id uuid not null default uuid_generate_v4(),
+  test_id uuid not null,
+  taken_on date not null,
   student_id uuid not null references students(id) on delete cascade,
   score numeric(6,2) not null,
   max_score numeric(6,2) not null,
   notes text,
-  unique(test_id, student_id)
+  primary key (id, taken_on),
+  unique(test_id, student_id, taken_on),
+  foreign key (test_id, taken_on) references performance_tests(id, taken_on) on delete cascade
+) partition by range (taken_on);
+
+-- Archived years: per-child rows are dropped and only these per-session/per-test summaries remain.
+create table if not exists history_archive (
+  year integer primary key,
+  archived_at timestamptz not null default now()
+);
+
+create table if not exists attendance_history_summary (
+  session_id uuid not null,
+  session_date date not null,
+  church_id uuid not null references churches(id) on delete cascade,
+  class_id uuid not null,
+  present_count bigint not null,
+  total_count bigint not null,
+  primary key (session_id, session_date),
+  foreign key (session_id, session_date) references attendance_sessions(id, session_date) on delete cascade
+);
+
+create table if not exists performance_history_summary (
+  test_id uuid not null,
+  taken_on date not null,
+  church_id uuid not null references churches(id) on delete cascade,
+  class_id uuid not null,
+  percent_sum numeric not null,
+  percent_count bigint not null,
+  primary key (test_id, taken_on),
+  foreign key (test_id, taken_on) references performance_tests(id, taken_on) on delete cascade
 );
 
 create table if not exists student_notes (
@@ -132,13 +190,297 @@ create table if not exists notifications (
   created_at timestamptz not null default now()
 );
 
+-- Report-card jobs: the worker running a job updates its row, and any worker can report progress.
+create table if not exists report_jobs (
+  id uuid primary key default uuid_generate_v4(),
+  church_id uuid not null references churches(id) on delete cascade,
+  created_by uuid references users(id) on delete set null,
+  type text not null,
+  status text not null default 'queued' check (status in ('queued', 'running', 'completed', 'failed')),
+  format text not null,
+  date_from date not null,
+  date_to date not null,
+  total integer not null default 0,
+  done integer not null default 0,
+  error text,
+  path text,
+  created_at timestamptz not null default now(),
+  finished_at timestamptz
+);
+
+-- Admins allowed to read the regional rollup, and for which region. Granted by an operator with the
+-- service role; custom_access_token_hook puts the region in the token as coordinator_region.
+create table if not exists regional_coordinators (
+  user_id uuid primary key references users(id) on delete cascade,
+  region text not null,
+  granted_at timestamptz not null default now()
+);
+
+-- Users removed while their access tokens are still valid; every API worker rejects those tokens.
+create table if not exists revoked_users (
+  user_id uuid primary key,
+  revoked_at timestamptz not null default now()
+);
+
+-- Delta-sync change feed (written by triggers, read through get_changes)
+create table if not exists change_log (
+  id bigserial primary key,
+  church_id uuid not null references churches(id) on delete cascade,
+  -- The writing transaction; get_changes orders and pages by it (see there).
+  xact_id bigint not null default pg_current_xact_id()::text::bigint,
+  table_name text not null,
+  row_id uuid not null,
+  op text not null check (op in ('insert', 'update', 'delete')),
+  data jsonb,
+  changed_at timestamptz not null default now()
+);
+
+create table if not exists change_log_state (
+  id boolean primary key default true check (id),
+  compacted_through bigint not null default 0,
+  -- Added to transaction ids to form cursors; non-zero only on installs upgraded from id cursors.
+  xact_offset bigint not null default 0
+);
+
+insert into change_log_state(id) values (true) on conflict (id) do nothing;
+
+-- Installs from before class_teachers carried church_id: backfill it from the class, so delete markers
+-- can still be scoped when the class is already gone (a cascade from deleting the class).
+alter table class_teachers add column if not exists church_id uuid references churches(id) on delete cascade;
+update class_teachers ct set church_id = c.church_id from classes c where c.id = ct.class_id and ct.church_id is null;
+alter table class_teachers alter column church_id set not null;
+
+-- Installs from before transaction-ordered cursors: cursors handed out so far are change_log ids.
+-- Shift transaction-based cursors above every one of them and mark them all compacted, so those
+-- clients reset once instead of comparing ids against transaction ids.
+do $$
+declare
+  v_next_id bigint;
+  v_xact bigint := pg_current_xact_id()::text::bigint;
+begin
+  alter table change_log_state add column if not exists xact_offset bigint not null default 0;
+  if not exists (
+    select 1 from information_schema.columns
+    where table_schema = 'public' and table_name = 'change_log' and column_name = 'xact_id'
+  ) then
+    alter table change_log add column xact_id bigint not null default pg_current_xact_id()::text::bigint;
+    select coalesce(max(id), 0) + 1 into v_next_id from change_log;
+    update change_log_state
+    set xact_offset = greatest(0, v_next_id - v_xact),
+        compacted_through = v_xact + greatest(0, v_next_id - v_xact);
+  end if;
+end $$;
+
 -- Useful indexes
 create index if not exists idx_users_church_role on users(church_id, role);
 create index if not exists idx_students_church_class on students(church_id, class_id);
 create index if not exists idx_attendance_sessions_church_date on attendance_sessions(church_id, session_date desc);
 create index if not exists idx_performance_tests_church_date on performance_tests(church_id, taken_on desc);
+create index if not exists idx_report_jobs_church_created on report_jobs(church_id, created_at);
 create index if not exists idx_notifications_church_created on notifications(church_id, created_at desc);
 
+-- Foreign-key hot paths. attendance_records(attendance_session_id), performance_scores(test_id) and
+-- attendance_sessions(class_id) are already served by the leading column of their unique constraints.
+create index if not exists idx_classes_church_name on classes(church_id, name);
+create index if not exists idx_class_teachers_teacher on class_teachers(teacher_id, class_id);
+create index if not exists idx_students_class_first_name on students(class_id, first_name);
+create index if not exists idx_student_notes_student on student_notes(student_id, created_at desc);
+create index if not exists idx_attendance_sessions_recorded_by on attendance_sessions(recorded_by, session_date desc);
+create index if not exists idx_attendance_records_student on attendance_records(student_id);
+create index if not exists idx_performance_tests_recorded_by on performance_tests(recorded_by, taken_on desc);
+create index if not exists idx_performance_tests_class on performance_tests(class_id, taken_on desc);
+create index if not exists idx_performance_scores_student on performance_scores(student_id);
+-- Covering indexes so the analytics RPCs read attendance/scores with index-only scans.
+create index if not exists idx_attendance_records_session_present on attendance_records(attendance_session_id) include (present);
+create index if not exists idx_performance_scores_test_score on performance_scores(test_id) include (score, max_score);
+create index if not exists idx_students_search_trgm on students using gin (
+  lower(first_name || ' ' || last_name || ' ' || guardian_name || ' ' || guardian_contact) gin_trgm_ops
+);
+drop index if exists idx_change_log_church_id;
+create index if not exists idx_change_log_church_xact on change_log(church_id, xact_id, id);
+create index if not exists idx_change_log_row on change_log(church_id, table_name, row_id, id desc);
+create index if not exists idx_churches_region on churches(region);
+create index if not exists idx_attendance_history_summary_church on attendance_history_summary(church_id, session_date);
+create index if not exists idx_performance_history_summary_church on performance_history_summary(church_id, taken_on);
+
+-- History partitions: one partition per table per year, plus a default partition for stray dates.
+create or replace function ensure_history_partitions(p_year integer)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  t text;
+  v_archived boolean := exists (select 1 from history_archive where year = p_year);
+begin
+  foreach t in array array['attendance_sessions', 'attendance_records', 'performance_tests', 'performance_scores'] loop
+    -- Archived years keep their sessions/tests; their records/scores live on as summaries only.
+    continue when v_archived and t in ('attendance_records', 'performance_scores');
+    if to_regclass('public.' || t || '_' || p_year) is null then
+      execute format(
+        'create table %I partition of %I for values from (%L) to (%L)',
+        t || '_' || p_year, t, make_date(p_year, 1, 1), make_date(p_year + 1, 1, 1)
+      );
+      execute format('alter table %I enable row level security', t || '_' || p_year);
+    end if;
+  end loop;
+end;
+$$;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['attendance_sessions', 'attendance_records', 'performance_tests', 'performance_scores'] loop
+    if to_regclass('public.' || t || '_default') is null then
+      execute format('create table %I partition of %I default', t || '_default', t);
+      execute format('alter table %I enable row level security', t || '_default');
+    end if;
+  end loop;
+end $$;
+
+select ensure_history_partitions(y)
+from generate_series(2020, extract(year from current_date)::int + 1) y;
+
+-- Archived years are read-only: writes would land in the default partition and miss the summaries.
+create or replace function reject_archived_history()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_date date := (to_jsonb(new)->>tg_argv[0])::date;
+begin
+  if exists (select 1 from history_archive where year = extract(year from v_date)) then
+    raise exception 'History for % is archived and read-only', extract(year from v_date)
+      using errcode = 'check_violation';
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists attendance_sessions_archived on attendance_sessions;
+create trigger attendance_sessions_archived before insert or update on attendance_sessions
+  for each row execute function reject_archived_history('session_date');
+drop trigger if exists attendance_records_archived on attendance_records;
+create trigger attendance_records_archived before insert or update on attendance_records
+  for each row execute function reject_archived_history('session_date');
+drop trigger if exists performance_tests_archived on performance_tests;
+create trigger performance_tests_archived before insert or update on performance_tests
+  for each row execute function reject_archived_history('taken_on');
+drop trigger if exists performance_scores_archived on performance_scores;
+create trigger performance_scores_archived before insert or update on performance_scores
+  for each row execute function reject_archived_history('taken_on');
+
+-- Summarise one year into the history summaries and drop its per-child partitions.
+create or replace function archive_history_year(p_year integer)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_from date := make_date(p_year, 1, 1);
+  v_to date := make_date(p_year + 1, 1, 1);
+begin
+  if exists (select 1 from history_archive where year = p_year) then
+    return;
+  end if;
+  if to_regclass('public.attendance_records_' || p_year) is null
+     or to_regclass('public.performance_scores_' || p_year) is null then
+    raise exception 'No history partitions for %', p_year;
+  end if;
+
+  execute format('lock table %I, %I in share mode', 'attendance_records_' || p_year, 'performance_scores_' || p_year);
+
+  insert into attendance_history_summary(session_id, session_date, church_id, class_id, present_count, total_count)
+  select s.id, s.session_date, s.church_id, s.class_id, count(*) filter (where r.present), count(*)
+  from attendance_sessions s
+  join attendance_records r on r.attendance_session_id = s.id and r.session_date = s.session_date
+  where s.session_date >= v_from and s.session_date < v_to
+  group by s.id, s.session_date, s.church_id, s.class_id
+  on conflict do nothing;
+
+  insert into performance_history_summary(test_id, taken_on, church_id, class_id, percent_sum, percent_count)
+  select t.id, t.taken_on, t.church_id, t.class_id,
+         coalesce(sum((ps.score / nullif(ps.max_score, 0)) * 100), 0),
+         count((ps.score / nullif(ps.max_score, 0)))
+  from performance_tests t
+  join performance_scores ps on ps.test_id = t.id and ps.taken_on = t.taken_on
+  where t.taken_on >= v_from and t.taken_on < v_to
+  group by t.id, t.taken_on, t.church_id, t.class_id
+  on conflict do nothing;
+
+  insert into history_archive(year) values (p_year);
+  execute format('alter table attendance_records detach partition %I', 'attendance_records_' || p_year);
+  execute format('drop table %I', 'attendance_records_' || p_year);
+  execute format('alter table performance_scores detach partition %I', 'performance_scores_' || p_year);
+  execute format('drop table %I', 'performance_scores_' || p_year);
+end;
+$$;
+
+-- Monthly upkeep: create next year's partitions and archive years older than p_keep_years (at least
+-- the current year is always kept live).
+create or replace function maintain_history(p_keep_years integer default 2)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_year integer := extract(year from current_date)::int;
+  v_cold integer[];
+  y integer;
+begin
+  perform ensure_history_partitions(v_year);
+  perform ensure_history_partitions(v_year + 1);
+  select array_agg(year order by year) into v_cold
+  from (
+    select substring(c.relname from '_(\d{4})$')::int as year
+    from pg_inherits i
+    join pg_class c on c.oid = i.inhrelid
+    where i.inhparent = 'attendance_records'::regclass
+      and c.relname ~ '_\d{4}$'
+  ) partitions
+  where year <= v_year - greatest(p_keep_years, 1);
+  foreach y in array coalesce(v_cold, '{}') loop
+    perform archive_history_year(y);
+  end loop;
+end;
+$$;
+
+-- Copy rows from pre-partitioning installs (set aside at the top of this file), then drop the old tables.
+do $$
+declare
+  y integer;
+begin
+  if to_regclass('public.attendance_sessions_legacy') is not null then
+    for y in select distinct extract(year from session_date)::int from attendance_sessions_legacy loop
+      perform ensure_history_partitions(y);
+    end loop;
+    insert into attendance_sessions(id, church_id, class_id, session_date, recorded_by, created_at)
+    select id, church_id, class_id, session_date, recorded_by, created_at from attendance_sessions_legacy;
+    insert into attendance_records(id, attendance_session_id, session_date, student_id, present, notes)
+    select r.id, r.attendance_session_id, s.session_date, r.student_id, r.present, r.notes
+    from attendance_records_legacy r
+    join attendance_sessions_legacy s on s.id = r.attendance_session_id;
+    drop table attendance_records_legacy, attendance_sessions_legacy;
+  end if;
+
+  if to_regclass('public.performance_tests_legacy') is not null then
+    for y in select distinct extract(year from taken_on)::int from performance_tests_legacy loop
+      perform ensure_history_partitions(y);
+    end loop;
+    insert into performance_tests(id, church_id, class_id, title, taken_on, recorded_by, created_at)
+    select id, church_id, class_id, title, taken_on, recorded_by, created_at from performance_tests_legacy;
+    insert into performance_scores(id, test_id, taken_on, student_id, score, max_score, notes)
+    select ps.id, ps.test_id, t.taken_on, ps.student_id, ps.score, ps.max_score, ps.notes
+    from performance_scores_legacy ps
+    join performance_tests_legacy t on t.id = ps.test_id;
+    drop table performance_scores_legacy, performance_tests_legacy;
+  end if;
+end $$;
+
 -- Analytics and birthdays RPCs
 create or replace function get_upcoming_birthdays(p_church_id uuid, p_days integer default 30)
 returns table(student_id uuid, full_name text, class_name text, date_of_birth date, days_until_birthday integer)
@@ -151,7 +493,7 @@ language sql stable as $$
       s.date_of_birth,
       make_date(extract(year from current_date)::int, extract(month from s.date_of_birth)::int, extract(day from s.date_of_birth)::int) as next_bday_this_year
     from students s
-    join classes c on c.id = s.class_id
+    join classes c on c.id = s.class_id and c.church_id = p_church_id
     where s.church_id = p_church_id
   )
   select
@@ -171,44 +513,582 @@ language sql stable as $$
   order by days_until_birthday asc;
 $$;
 
+-- Analytics cover the 12 most recent dates. They first pick those dates from the (small) session/test
+-- tables so that only the partitions from the cutoff onwards are read, then add any archived summaries.
 create or replace function get_attendance_analytics(p_church_id uuid, p_teacher_id uuid default null)
 returns table(session_date date, present_count bigint, total_count bigint, attendance_rate numeric)
 language sql stable as $$
+  with sessions as (
+    select s.id, s.session_date
+    from attendance_sessions s
+    where s.church_id = p_church_id
+      and (p_teacher_id is null or exists (
+        select 1 from class_teachers ct
+        where ct.class_id = s.class_id and ct.teacher_id = p_teacher_id
+      ))
+  ),
+  cutoff as (
+    select min(d.session_date) as session_date
+    from (
+      select distinct s.session_date
+      from sessions s
+      where exists (
+        select 1 from attendance_records r
+        where r.attendance_session_id = s.id and r.session_date = s.session_date
+      ) or exists (
+        select 1 from attendance_history_summary h
+        where h.session_id = s.id and h.session_date = s.session_date
+      )
+      order by s.session_date desc
+      limit 12
+    ) d
+  ),
+  counts as (
+    select s.session_date, r.present::int as present_count, 1 as total_count
+    from sessions s
+    join attendance_records r on r.attendance_session_id = s.id and r.session_date = s.session_date
+    where s.session_date >= (select session_date from cutoff)
+      and r.session_date >= (select session_date from cutoff)
+    union all
+    select s.session_date, h.present_count, h.total_count
+    from sessions s
+    join attendance_history_summary h on h.session_id = s.id and h.session_date = s.session_date
+    where s.session_date >= (select session_date from cutoff)
+  )
   select
-    s.session_date,
-    count(*) filter (where r.present) as present_count,
-    count(*) as total_count,
-    round((count(*) filter (where r.present)::numeric / nullif(count(*), 0)) * 100, 2) as attendance_rate
-  from attendance_sessions s
-  join attendance_records r on r.attendance_session_id = s.id
-  where s.church_id = p_church_id
-    and (p_teacher_id is null or exists (
-      select 1 from class_teachers ct
-      where ct.class_id = s.class_id and ct.teacher_id = p_teacher_id
-    ))
-  group by s.session_date
-  order by s.session_date desc
+    c.session_date,
+    sum(c.present_count)::bigint as present_count,
+    sum(c.total_count)::bigint as total_count,
+    round((sum(c.present_count)::numeric / nullif(sum(c.total_count), 0)) * 100, 2) as attendance_rate
+  from counts c
+  group by c.session_date
+  order by c.session_date desc
   limit 12;
 $$;
 
 create or replace function get_performance_analytics(p_church_id uuid, p_teacher_id uuid default null)
 returns table(taken_on date, avg_percent numeric)
 language sql stable as $$
+  with tests as (
+    select t.id, t.taken_on
+    from performance_tests t
+    where t.church_id = p_church_id
+      and (p_teacher_id is null or exists (
+        select 1 from class_teachers ct
+        where ct.class_id = t.class_id and ct.teacher_id = p_teacher_id
+      ))
+  ),
+  cutoff as (
+    select min(d.taken_on) as taken_on
+    from (
+      select distinct t.taken_on
+      from tests t
+      where exists (
+        select 1 from performance_scores ps
+        where ps.test_id = t.id and ps.taken_on = t.taken_on
+      ) or exists (
+        select 1 from performance_history_summary h
+        where h.test_id = t.id and h.taken_on = t.taken_on
+      )
+      order by t.taken_on desc
+      limit 12
+    ) d
+  ),
+  percents as (
+    select t.taken_on, (ps.score / nullif(ps.max_score, 0)) * 100 as percent_sum,
+           case when ps.max_score <> 0 then 1 else 0 end as percent_count
+    from tests t
+    join performance_scores ps on ps.test_id = t.id and ps.taken_on = t.taken_on
+    where t.taken_on >= (select taken_on from cutoff)
+      and ps.taken_on >= (select taken_on from cutoff)
+    union all
+    select t.taken_on, h.percent_sum, h.percent_count
+    from tests t
+    join performance_history_summary h on h.test_id = t.id and h.taken_on = t.taken_on
+    where t.taken_on >= (select taken_on from cutoff)
+  )
   select
-    t.taken_on,
-    round(avg((ps.score / nullif(ps.max_score, 0)) * 100), 2) as avg_percent
-  from performance_tests t
-  join performance_scores ps on ps.test_id = t.id
-  where t.church_id = p_church_id
-    and (p_teacher_id is null or exists (
-      select 1 from class_teachers ct
-      where ct.class_id = t.class_id and ct.teacher_id = p_teacher_id
-    ))
-  group by t.taken_on
-  order by t.taken_on desc
+    p.taken_on,
+    round(sum(p.percent_sum) / nullif(sum(p.percent_count), 0), 2) as avg_percent
+  from percents p
+  group by p.taken_on
+  order by p.taken_on desc
   limit 12;
 $$;
 
+-- Regional rollup: one row per branch in the region plus a totals row (church_id null), over live
+-- partitions and archived summaries in [p_from, p_to].
+create or replace function get_regional_analytics(p_region text, p_from date, p_to date)
+returns table(
+  church_id uuid,
+  name text,
+  branch_name text,
+  district text,
+  area text,
+  sessions bigint,
+  present_count bigint,
+  total_count bigint,
+  attendance_rate numeric,
+  tests bigint,
+  avg_percent numeric
+)
+language sql stable as $$
+  with branches as (
+    select c.id, c.name, c.branch_name, c.district, c.area
+    from churches c
+    where c.region = p_region
+  ),
+  attendance as (
+    select s.church_id, s.id as session_id, r.present::int as present_count, 1 as total_count
+    from branches b
+    join attendance_sessions s on s.church_id = b.id
+    join attendance_records r on r.attendance_session_id = s.id and r.session_date = s.session_date
+    where s.session_date between p_from and p_to
+      and r.session_date between p_from and p_to
+    union all
+    select h.church_id, h.session_id, h.present_count, h.total_count
+    from branches b
+    join attendance_history_summary h on h.church_id = b.id
+    where h.session_date between p_from and p_to
+  ),
+  attendance_by_branch as (
+    select a.church_id, count(distinct a.session_id) as sessions, sum(a.present_count) as present_count, sum(a.total_count) as total_count
+    from attendance a
+    group by a.church_id
+  ),
+  performance as (
+    select t.church_id, t.id as test_id, (ps.score / nullif(ps.max_score, 0)) * 100 as percent_sum,
+           case when ps.max_score <> 0 then 1 else 0 end as percent_count
+    from branches b
+    join performance_tests t on t.church_id = b.id
+    join performance_scores ps on ps.test_id = t.id and ps.taken_on = t.taken_on
+    where t.taken_on between p_from and p_to
+      and ps.taken_on between p_from and p_to
+    union all
+    select h.church_id, h.test_id, h.percent_sum, h.percent_count
+    from branches b
+    join performance_history_summary h on h.church_id = b.id
+    where h.taken_on between p_from and p_to
+  ),
+  performance_by_branch as (
+    select p.church_id, count(distinct p.test_id) as tests, sum(p.percent_sum) as percent_sum, sum(p.percent_count) as percent_count
+    from performance p
+    group by p.church_id
+  ),
+  rollup as (
+    select
+      b.id, b.name, b.branch_name, b.district, b.area,
+      coalesce(a.sessions, 0) as sessions,
+      coalesce(a.present_count, 0) as present_count,
+      coalesce(a.total_count, 0) as total_count,
+      coalesce(p.tests, 0) as tests,
+      coalesce(p.percent_sum, 0) as percent_sum,
+      coalesce(p.percent_count, 0) as percent_count
+    from branches b
+    left join attendance_by_branch a on a.church_id = b.id
+    left join performance_by_branch p on p.church_id = b.id
+  )
+  select
+    r.id, r.name, r.branch_name, r.district, r.area,
+    sum(r.sessions)::bigint,
+    sum(r.present_count)::bigint,
+    sum(r.total_count)::bigint,
+    round((sum(r.present_count)::numeric / nullif(sum(r.total_count), 0)) * 100, 2),
+    sum(r.tests)::bigint,
+    round(sum(r.percent_sum) / nullif(sum(r.percent_count), 0), 2)
+  from rollup r
+  group by grouping sets ((r.id, r.name, r.branch_name, r.district, r.area), ())
+  order by r.id is null, r.name, r.branch_name;
+$$;
+
+-- Report-card data for one class in a single call: every student with their attendance, scores and
+-- notes between p_from and p_to.
+create or replace function get_class_report_data(p_church_id uuid, p_class_id uuid, p_from date, p_to date)
+returns jsonb
+language sql stable as $$
+  select jsonb_build_object(
+    'class', jsonb_build_object('id', c.id, 'name', c.name, 'age_group', c.age_group),
+    'teachers', coalesce((
+      select jsonb_agg(u.full_name order by u.full_name)
+      from class_teachers ct
+      join users u on u.id = ct.teacher_id
+      where ct.class_id = c.id
+    ), '[]'::jsonb),
+    'students', coalesce((
+      select jsonb_agg(jsonb_build_object(
+        'id', s.id,
+        'first_name', s.first_name,
+        'last_name', s.last_name,
+        'date_of_birth', s.date_of_birth,
+        'attendance', (
+          select jsonb_build_object('present', count(*) filter (where r.present), 'total', count(*))
+          from attendance_records r
+          where r.student_id = s.id
+            and r.session_date between p_from and p_to
+        ),
+        'scores', coalesce((
+          select jsonb_agg(jsonb_build_object(
+            'title', t.title, 'taken_on', t.taken_on, 'score', ps.score, 'max_score', ps.max_score
+          ) order by t.taken_on)
+          from performance_scores ps
+          join performance_tests t on t.id = ps.test_id and t.taken_on = ps.taken_on
+          where ps.student_id = s.id
+            and ps.taken_on between p_from and p_to
+        ), '[]'::jsonb),
+        'notes', coalesce((
+          select jsonb_agg(jsonb_build_object('note', n.note, 'created_at', n.created_at, 'author', a.full_name) order by n.created_at)
+          from student_notes n
+          left join users a on a.id = n.author_id
+          where n.student_id = s.id
+            and n.created_at >= p_from
+            and n.created_at < p_to + 1
+        ), '[]'::jsonb)
+      ) order by s.last_name, s.first_name)
+      from students s
+      where s.class_id = c.id
+    ), '[]'::jsonb)
+  )
+  from classes c
+  where c.id = p_class_id and c.church_id = p_church_id;
+$$;
+
+-- One row per class for the admin classes pages: roster size, teachers, last session and the
+-- attendance rate over sessions since p_since (the last four weeks by default).
+create or replace function get_class_overview(p_church_id uuid, p_since date default current_date - 28)
+returns table(
+  id uuid,
+  name text,
+  description text,
+  age_group text,
+  student_count bigint,
+  teachers jsonb,
+  last_session_date date,
+  present_count bigint,
+  total_count bigint,
+  attendance_rate numeric
+)
+language sql stable as $$
+  with roster as (
+    select s.class_id, count(*) as student_count
+    from students s
+    where s.church_id = p_church_id
+    group by s.class_id
+  ),
+  recent as (
+    select a.class_id, count(*) filter (where r.present) as present_count, count(*) as total_count
+    from attendance_sessions a
+    join attendance_records r on r.attendance_session_id = a.id and r.session_date = a.session_date
+    where a.church_id = p_church_id
+      and a.session_date >= p_since
+      and r.session_date >= p_since
+    group by a.class_id
+  )
+  select
+    c.id,
+    c.name,
+    c.description,
+    c.age_group,
+    coalesce(ro.student_count, 0),
+    coalesce((
+      select jsonb_agg(jsonb_build_object('id', u.id, 'full_name', u.full_name) order by u.full_name)
+      from class_teachers ct
+      join users u on u.id = ct.teacher_id
+      where ct.class_id = c.id
+    ), '[]'::jsonb),
+    (select max(a.session_date) from attendance_sessions a where a.class_id = c.id),
+    coalesce(re.present_count, 0),
+    coalesce(re.total_count, 0),
+    round((re.present_count::numeric / nullif(re.total_count, 0)) * 100, 2)
+  from classes c
+  left join roster ro on ro.class_id = c.id
+  left join recent re on re.class_id = c.id
+  where c.church_id = p_church_id
+  order by c.name;
+$$;
+
+-- Student search; the expression must match idx_students_search_trgm for the index to be used
+create or replace function search_students(
+  p_church_id uuid,
+  p_query text,
+  p_class_ids uuid[] default null,
+  p_limit integer default 20
+)
+returns table(
+  id uuid,
+  class_id uuid,
+  first_name text,
+  last_name text,
+  guardian_name text,
+  guardian_contact text,
+  avatar_url text,
+  rank real
+)
+language sql stable as $$
+  -- The term is matched literally: %, _ and the escape character itself are escaped for like.
+  with q as (
+    select
+      lower(trim(p_query)) as term,
+      '%' || replace(replace(replace(lower(trim(p_query)), '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+  ),
+  matches as (
+    select
+      s.*,
+      lower(s.first_name || ' ' || s.last_name || ' ' || s.guardian_name || ' ' || s.guardian_contact) as doc
+    from students s, q
+    where s.church_id = p_church_id
+      and (p_class_ids is null or s.class_id = any(p_class_ids))
+      and (
+        q.term <% lower(s.first_name || ' ' || s.last_name || ' ' || s.guardian_name || ' ' || s.guardian_contact)
+        or lower(s.first_name || ' ' || s.last_name || ' ' || s.guardian_name || ' ' || s.guardian_contact) like q.pattern escape '\'
+      )
+  )
+  select
+    m.id,
+    m.class_id,
+    m.first_name,
+    m.last_name,
+    m.guardian_name,
+    m.guardian_contact,
+    m.avatar_url,
+    (case when m.doc like q.pattern escape '\' then 1 else 0 end + word_similarity(q.term, m.doc))::real as rank
+  from matches m, q
+  order by rank desc, m.first_name, m.last_name
+  limit p_limit;
+$$;
+
+-- Teacher profiles are created with their auth user: the admin API sets role and church_id in
+-- app_metadata (which only the service role can set) and the rest of the profile in user_metadata,
+-- and this trigger inserts the users row in the same transaction. Both metadata objects end up in
+-- every access token, so the personal details under user_metadata.profile are removed once copied.
+-- GoTrue may write app_metadata after the initial insert, so updates are handled too.
+create or replace function create_profile_from_app_metadata()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_role text := new.raw_app_meta_data->>'role';
+  v_church_id uuid := (new.raw_app_meta_data->>'church_id')::uuid;
+  v_profile jsonb := coalesce(new.raw_user_meta_data->'profile', '{}'::jsonb);
+begin
+  if v_role is not null and v_church_id is not null then
+    insert into users(id, full_name, email, phone, role, church_id, date_of_birth)
+    values (
+      new.id,
+      new.raw_user_meta_data->>'full_name',
+      new.email,
+      v_profile->>'phone',
+      v_role::app_role,
+      v_church_id,
+      (v_profile->>'date_of_birth')::date
+    )
+    on conflict (id) do nothing;
+    if new.raw_user_meta_data ? 'profile' then
+      update auth.users set raw_user_meta_data = raw_user_meta_data - 'profile' where id = new.id;
+    end if;
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists on_auth_user_profile on auth.users;
+create trigger on_auth_user_profile after insert or update of raw_app_meta_data on auth.users
+  for each row execute function create_profile_from_app_metadata();
+
+-- Supabase Auth access-token hook: adds the caller's app role, church and any coordinator region to
+-- every issued JWT so the API can authorize without reading `users`. `role` is left alone (it is the
+-- Postgres role).
+-- Enable under Authentication > Hooks > Customize Access Token, or in config.toml:
+--   [auth.hook.custom_access_token]
+--   enabled = true
+--   uri = "pg-functions://postgres/public/custom_access_token_hook"
+create or replace function custom_access_token_hook(event jsonb)
+returns jsonb
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+declare
+  v_claims jsonb := event->'claims';
+  v_role app_role;
+  v_church_id uuid;
+  v_coordinator_region text;
+begin
+  select u.role, u.church_id, rc.region into v_role, v_church_id, v_coordinator_region
+  from users u
+  left join regional_coordinators rc on rc.user_id = u.id
+  where u.id = (event->>'user_id')::uuid;
+  v_claims := v_claims - 'coordinator_region';
+  if found then
+    v_claims := v_claims || jsonb_build_object('user_role', v_role, 'church_id', v_church_id);
+    if v_coordinator_region is not null then
+      v_claims := v_claims || jsonb_build_object('coordinator_region', v_coordinator_region);
+    end if;
+  else
+    v_claims := v_claims - 'user_role' - 'church_id';
+  end if;
+  return jsonb_set(event, '{claims}', v_claims);
+end;
+$$;
+
+-- Idempotent assignment: returns the new or existing row, or nothing if the class or teacher is
+-- not in the church.
+create or replace function assign_teacher(p_church_id uuid, p_class_id uuid, p_teacher_id uuid)
+returns setof class_teachers
+language sql as $$
+  with inserted as (
+    insert into class_teachers(church_id, class_id, teacher_id)
+    select c.church_id, c.id, u.id
+    from classes c
+    join users u on u.church_id = c.church_id
+    where c.id = p_class_id
+      and c.church_id = p_church_id
+      and u.id = p_teacher_id
+      and u.role = 'teacher'
+    on conflict (class_id, teacher_id) do nothing
+    returning *
+  )
+  select * from inserted
+  union all
+  select ct.*
+  from class_teachers ct
+  join classes c on c.id = ct.class_id
+  where ct.class_id = p_class_id
+    and ct.teacher_id = p_teacher_id
+    and c.church_id = p_church_id
+    and not exists (select 1 from inserted);
+$$;
+
+-- Deleting the auth user cascades to the profile, so one statement removes both.
+create or replace function remove_teacher(p_church_id uuid, p_teacher_id uuid)
+returns uuid
+language sql
+security definer
+set search_path = public
+as $$
+  with removed as (
+    delete from auth.users a
+    using users u
+    where a.id = u.id
+      and u.id = p_teacher_id
+      and u.church_id = p_church_id
+      and u.role = 'teacher'
+    returning a.id
+  ), revoked as (
+    insert into revoked_users(user_id)
+    select id from removed
+    on conflict (user_id) do update set revoked_at = now()
+  ), expired as (
+    -- Supabase caps access-token expiry at one week, so older entries can no longer match a token.
+    delete from revoked_users where revoked_at < now() - interval '7 days'
+  )
+  select id from removed;
+$$;
+
+-- Change feed: one log row per insert/update/delete, compacted by compact_change_log()
+create or replace function record_change()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_row jsonb := case when tg_op = 'DELETE' then to_jsonb(old) else to_jsonb(new) end;
+  v_church_id uuid := (v_row->>'church_id')::uuid;
+  -- Passed explicitly: on partitioned tables tg_table_name is the partition, not the logical table.
+  v_table text := tg_argv[0];
+begin
+  -- Deletes keep the old row so the API can scope tombstones; it is never returned to clients.
+  if v_church_id is not null then
+    insert into change_log(church_id, table_name, row_id, op, data)
+    values (v_church_id, v_table, (v_row->>'id')::uuid, lower(tg_op), v_row);
+  end if;
+  return null;
+end;
+$$;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['students', 'classes', 'class_teachers', 'attendance_sessions', 'performance_tests'] loop
+    execute format('drop trigger if exists %I on %I', t || '_change_log', t);
+    execute format(
+      'create trigger %I after insert or update or delete on %I for each row execute function record_change(%L)',
+      t || '_change_log',
+      t,
+      t
+    );
+  end loop;
+end $$;
+
+-- Cursors are transaction ids (plus xact_offset), not change ids: ids are taken at insert but become
+-- visible at commit, so a client could read id N+1 and move past an N still being written. Only changes
+-- from transactions below the snapshot's xmin are returned; all of those have finished, so nothing can
+-- later appear behind the cursor. Pages end on a transaction boundary.
+create or replace function get_changes(p_church_id uuid, p_since bigint, p_limit integer default 500)
+returns jsonb
+language sql stable as $$
+  with state as (
+    select compacted_through, xact_offset, pg_snapshot_xmin(pg_current_snapshot())::text::bigint as horizon
+    from change_log_state
+  ),
+  eligible as (
+    select l.*
+    from change_log l, state s
+    where l.church_id = p_church_id
+      and l.xact_id > p_since - s.xact_offset
+      and l.xact_id < s.horizon
+  ),
+  boundary as (
+    select xact_id from eligible order by xact_id, id offset greatest(p_limit - 1, 0) limit 1
+  ),
+  kept as (
+    select * from eligible
+    where not exists (select 1 from boundary) or xact_id <= (select xact_id from boundary)
+  ),
+  latest as (
+    select distinct on (table_name, row_id) * from kept
+    order by table_name, row_id, xact_id desc, id desc
+  )
+  select jsonb_build_object(
+    'compacted_through', s.compacted_through,
+    'latest', s.horizon - 1 + s.xact_offset,
+    'has_more', exists (select 1 from eligible where xact_id > (select xact_id from boundary)),
+    'cursor', coalesce((select max(xact_id) from kept) + s.xact_offset, p_since),
+    'changes', coalesce(
+      (select jsonb_agg(jsonb_build_object('table', table_name, 'id', row_id, 'op', op, 'row', data) order by xact_id, id) from latest),
+      '[]'::jsonb
+    )
+  )
+  from state s;
+$$;
+
+create or replace function compact_change_log(p_retain interval default interval '30 days')
+returns void
+language plpgsql
+as $$
+declare
+  v_horizon bigint;
+begin
+  -- Entries superseded by a later change to the same row never need to be replayed.
+  delete from change_log c
+  using change_log newer
+  where newer.church_id = c.church_id
+    and newer.table_name = c.table_name
+    and newer.row_id = c.row_id
+    and newer.id > c.id;
+
+  select max(xact_id) into v_horizon from change_log where changed_at < now() - p_retain;
+  if v_horizon is not null then
+    delete from change_log where xact_id <= v_horizon;
+    update change_log_state set compacted_through = greatest(compacted_through, v_horizon + xact_offset);
+  end if;
+end;
+$$;
+
 -- Birthday notification helper (optional scheduled by pg_cron / edge function)
 create or replace function create_daily_birthday_notifications()
 returns void
@@ -238,6 +1118,19 @@ begin
 end;
 $$;
 
+-- Write and maintenance RPCs are for the service role only (Supabase grants execute to anon by default)
+revoke execute on function
+  assign_teacher(uuid, uuid, uuid),
+  remove_teacher(uuid, uuid),
+  ensure_history_partitions(integer),
+  archive_history_year(integer),
+  maintain_history(integer),
+  compact_change_log(interval),
+  custom_access_token_hook(jsonb)
+from public, anon, authenticated;
+
+grant execute on function custom_access_token_hook(jsonb) to supabase_auth_admin;
+
 -- RLS
 alter table users enable row level security;
 alter table classes enable row level security;
@@ -250,6 +1143,14 @@ alter table performance_scores enable row level security;
 alter table student_notes enable row level security;
 alter table notifications enable row level security;
 alter table user_settings enable row level security;
+alter table change_log enable row level security;
+alter table change_log_state enable row level security;
+alter table report_jobs enable row level security;
+alter table revoked_users enable row level security;
+alter table regional_coordinators enable row level security;
+alter table history_archive enable row level security;
+alter table attendance_history_summary enable row level security;
+alter table performance_history_summary enable row level security;
 
 create policy "same church users" on users for select using (
   church_id = (select church_id from users where id = auth.uid())
@@ -312,6 +1213,11 @@ with check (
   )
 );
 
+-- Report-card ZIPs are private; the API hands out short-lived signed URLs.
+insert into storage.buckets (id, name, public)
+values ('report-cards', 'report-cards', false)
+on conflict (id) do nothing;
+
 -- Schedule birthday notifications daily at 06:00 UTC
 create extension if not exists pg_cron;
 
@@ -330,3 +1236,37 @@ select cron.schedule(
   '0 6 * * *',
   $$select create_daily_birthday_notifications();$$
 );
+
+-- Compact the change feed weekly (Sunday 03:00 UTC)
+do $$
+declare
+  existing_job_id bigint;
+begin
+  select jobid into existing_job_id from cron.job where jobname = 'weekly_change_log_compaction';
+  if existing_job_id is not null then
+    perform cron.unschedule(existing_job_id);
+  end if;
+end $$;
+
+select cron.schedule(
+  'weekly_change_log_compaction',
+  '0 3 * * 0',
+  $$select compact_change_log();$$
+);
+
+-- Create next year's history partitions and archive cold years monthly (1st, 04:00 UTC)
+do $$
+declare
+  existing_job_id bigint;
+begin
+  select jobid into existing_job_id from cron.job where jobname = 'monthly_history_maintenance';
+  if existing_job_id is not null then
+    perform cron.unschedule(existing_job_id);
+  end if;
+end $$;
+
+select cron.schedule(
+  'monthly_history_maintenance',
+  '0 4 1 * *',
+  $$select maintain_history();$$
+);